@@ -1,19 +1,35 @@
 import pandas as pd
-from openpyxl import Workbook
+import numpy as np
+from bisect import bisect_left, insort
+from collections import deque
 from datetime import datetime, timedelta
-from openpyxl.styles import PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Border, Side
 import tempfile
 import os
+from datasets import load_myteam, load_assets, load_derived
+from reports import write_report, alternating_course_colors
+from metrics import span
+
+
+# How process_excel hands out devices: 'first_fit' gives every seat its own device in
+# seat order, 'window' reuses devices across courses that do not overlap (see allocate_laptops_window)
+ALLOCATION_MODES = ('first_fit', 'window')
 
 
 def process_excel(input_file, output_file, start_date, end_date, include_course_types, assets_file, columns_to_keep, rsaf_laptops, a380_laptops,
-                  cannot_assign_laptops, cannot_assign_ipads, customers_to_exclude
+                  cannot_assign_laptops, cannot_assign_ipads, customers_to_exclude, return_report=False, allocation_mode='first_fit'
                   ):
+    """
+    Allocates laptops and iPads to the courses starting between start_date and end_date and
+    saves the deployment list to a temporary .xlsx file. allocation_mode is one of
+    ALLOCATION_MODES.
+
+    Returns:
+        str: Path of the saved file, or (path, report DataFrame, row colors) when return_report
+        is set so callers can show the report without reading the file back.
+    """
     try:
         # Load the course data
-        df = pd.read_excel(input_file)
+        df = load_myteam(input_file)
         
         
 
@@ -46,7 +62,7 @@ def process_excel(input_file, output_file, start_date, end_date, include_course_
         df = df.sort_values(by=['From', 'Course'])
 
         # Load the assets file (CSV)
-        assets_df = pd.read_csv(assets_file)
+        assets_df = load_assets(assets_file)
 
         # Filter only relevant columns (Asset ID, Location, FSA)
         assets_df = assets_df[['Asset ID', 'Location', 'FSA']]
@@ -74,117 +90,53 @@ def process_excel(input_file, output_file, start_date, end_date, include_course_
         
 
         # Exclude restricted iPads
+        cannot_assign_ipads = frozenset(cannot_assign_ipads)
         eligible_ipads = [ipad for ipad in ipads if ipad not in cannot_assign_ipads]
 
         # Debug: Check eligible iPads after filtering
        
 
         # Prepare the new columns for laptops and iPads
-        df['Staff ID(Lenovo Yoga)'] = None
-        df['Staff ID(Apple iPad)'] = None
-        df['FSA'] = None
-
-        # Assign laptops based on specific conditions
-        for i, row in df.iterrows():
-            # Determine the filtered laptops based on conditions
-            if row['Customer'] == '99Y':
-                # Assign only from RSAF laptops
-                filtered_laptops = laptops_df[laptops_df['Asset ID'].isin(rsaf_laptops)]
-            elif row['Course Type'].startswith('L') and row['Customer'] == 'SIA':
-                # Assign only from A380 laptops
-                filtered_laptops = laptops_df[laptops_df['Asset ID'].isin(a380_laptops)]
-            else:
-                # Assign from laptops not in restricted lists
-                filtered_laptops = laptops_df[
-                    ~laptops_df['Asset ID'].isin(rsaf_laptops) & 
-                    ~laptops_df['Asset ID'].isin(a380_laptops) & 
-                    ~laptops_df['Asset ID'].isin(cannot_assign_laptops)
-                ]
-
-            # Assign the first available laptop that hasn't been assigned yet
-            for _, laptop_row in filtered_laptops.iterrows():
-                laptop = laptop_row['Asset ID']
-                if laptop not in df['Staff ID(Lenovo Yoga)'].values:  # Ensure no duplication
-                    df.at[i, 'Staff ID(Lenovo Yoga)'] = laptop
-                    df.at[i, 'FSA'] = laptop_row['FSA']  # Assign the associated FSA
-                    break
-
-        ipad_index = 0
-
-        # Exclude restricted iPads
-        eligible_ipads = [ipad for ipad in ipads if ipad not in cannot_assign_ipads]
-        
-
-        for i, row in df.iterrows():
-            # Check if the course type qualifies for an iPad
-            if row['Course Type'][0] in ['E', 'G'] and row['Customer'] != '99Y':
-                
-                if ipad_index < len(eligible_ipads):
-                    # Assign the next available eligible iPad
-                    df.at[i, 'Staff ID(Apple iPad)'] = eligible_ipads[ipad_index]
-                    
-                    ipad_index += 1
-                else:
-                    print(f"No more iPads available for Row {i}")  # Debug: Log when no iPads remain
-
+        if allocation_mode == 'window':
+            with span('allocate_laptops_window'):
+                laptop_ids, laptop_fsas = allocate_laptops_window(df, laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops)
+            with span('allocate_ipads_window'):
+                ipad_ids = allocate_ipads_window(df, eligible_ipads)
+        else:
+            with span('allocate_laptops'):
+                laptop_ids, laptop_fsas = allocate_laptops(df, laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops)
+            with span('allocate_ipads'):
+                ipad_ids = allocate_ipads(df, eligible_ipads)
+        df['Staff ID(Lenovo Yoga)'] = pd.Series(laptop_ids, index=df.index, dtype=object)
+        df['Staff ID(Apple iPad)'] = pd.Series(ipad_ids, index=df.index, dtype=object)
 
         # Add the FSA values to the new file, based on Asset ID
-        for i, row in df.iterrows():
-            if row['Staff ID(Lenovo Yoga)'] is not None:
-                laptop_fsa = assets_df[assets_df['Asset ID'] == row['Staff ID(Lenovo Yoga)']]['FSA'].values
-                if laptop_fsa:
-                    df.at[i, 'FSA'] = laptop_fsa[0]
+        fsa_by_asset = assets_df.drop_duplicates(subset='Asset ID').set_index('Asset ID')['FSA'].to_dict()
+        for position, laptop in enumerate(laptop_ids):
+            if laptop is not None and fsa_by_asset.get(laptop):
+                laptop_fsas[position] = fsa_by_asset[laptop]
+        df['FSA'] = pd.Series(laptop_fsas, index=df.index, dtype=object)
 
         # Remove the 'Course Type' column
         df.drop(columns=['Course Type'], inplace=True)
 
-        # Create a new workbook
-        wb = Workbook()
-        ws = wb.active
-
-        # Write headers
-        for col_num, value in enumerate(df.columns.values, 1):
-            ws.cell(row=1, column=col_num, value=value)
-
-        # Write data
-        for row_idx, row in enumerate(dataframe_to_rows(df, index=False, header=False), start=2):
-            for col_idx, value in enumerate(row, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                if col_idx in [2, 3]:  # 'From' and 'To' columns
-                    cell.value = datetime.strptime(str(cell.value), '%Y-%m-%d').strftime('%d-%b-%y')
-
-        # Define color map for the courses
-        courses = df['Course'].unique()
-        color_map = {'Light Gray': 'D9D9D9', 'Orange': 'FCE4D6'}
-        course_colors = {course: color_map['Light Gray'] if i % 2 == 0 else color_map['Orange'] for i, course in enumerate(courses)}
-
-        # Apply colors based on the course
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-            course_value = row[0].value  # Assuming 'Course' is the first column
-            if course_value in course_colors:
-                fill = PatternFill(start_color=course_colors[course_value], end_color=course_colors[course_value], fill_type="solid")
-                for cell in row:
-                    cell.fill = fill
-
-        # Auto-resize columns
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column].width = adjusted_width
+        # Format the 'From' and 'To' columns as '15-Jan-25'
+        df['From'] = pd.to_datetime(df['From']).dt.strftime('%d-%b-%y')
+        df['To'] = pd.to_datetime(df['To']).dt.strftime('%d-%b-%y')
+
+        # Color the rows of each course, alternating light gray and orange
+        course_colors = alternating_course_colors(df['Course'])
+        row_colors = [course_colors[course] if pd.notna(course) else None for course in df['Course']]
 
         # Create a temporary file and save the workbook there
         temp_dir = tempfile.gettempdir()  # Get temporary directory path
         temp_file_path = os.path.join(temp_dir, f'{output_file}.xlsx')  # Define temp file path
 
-        wb.save(temp_file_path)  # Save to temp file
+        with span('write_report'):
+            write_report(df, temp_file_path, row_colors=row_colors)  # Save to temp file
 
+        if return_report:
+            return temp_file_path, df, row_colors
         return temp_file_path  # Return path of the saved file for download
 
 
@@ -192,9 +144,236 @@ def process_excel(input_file, output_file, start_date, end_date, include_course_
         print("Error")
 
 
-def process_overdue_devices_with_save(excel_file, csv_file, OD_Days, output_file="overdue_devices"):
+def allocate_laptops(courses_df, laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops):
+    """
+    Assigns laptops to course seats in a single pass.
+
+    The laptop pool is split once into FIFO queues (RSAF, A380 and general) that keep the
+    order of laptops_df, and each seat takes the first laptop of its queue that has not
+    been handed out yet.
+
+    Args:
+        courses_df (DataFrame): Course seats in allocation order, with 'Customer' and 'Course Type'.
+        laptops_df (DataFrame): Assignable laptops in priority order, with 'Asset ID' and 'FSA'.
+
+    Returns:
+        tuple: (laptop IDs, FSA values), one entry per seat, None where the queue ran out.
+    """
+    # Partition the pool once instead of re-filtering it for every seat
+    queues = {pool: deque(laptops) for pool, laptops in laptop_pools(laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops).items()}
+    pools = seat_laptop_pools(courses_df)
+
+    used = set()
+    laptop_ids = []
+    laptop_fsas = []
+    for pool in pools:
+        queue = queues[pool]
+        # A laptop listed in two pools may already have been handed out through the other one
+        while queue and queue[0][0] in used:
+            queue.popleft()
+        if queue:
+            asset_id, fsa = queue.popleft()
+            used.add(asset_id)
+            laptop_ids.append(asset_id)
+            laptop_fsas.append(fsa)
+        else:
+            laptop_ids.append(None)
+            laptop_fsas.append(None)
+
+    return laptop_ids, laptop_fsas
+
+
+def laptop_pools(laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops):
+    """
+    Splits the assignable laptops into the RSAF, A380 and General pools.
+
+    The RSAF and A380 pools hold the laptops listed in those settings; the General pool
+    holds every other laptop that is not in cannot_assign_laptops.
+
+    Returns:
+        dict: Pool name -> list of (Asset ID, FSA), in the order of laptops_df.
+    """
+    rsaf_laptops = frozenset(rsaf_laptops)
+    a380_laptops = frozenset(a380_laptops)
+    cannot_assign_laptops = frozenset(cannot_assign_laptops)
+
+    pools = {'RSAF': [], 'A380': [], 'General': []}
+    for asset_id, fsa in zip(laptops_df['Asset ID'].tolist(), laptops_df['FSA'].tolist()):
+        if asset_id in rsaf_laptops:
+            pools['RSAF'].append((asset_id, fsa))
+        if asset_id in a380_laptops:
+            pools['A380'].append((asset_id, fsa))
+        if asset_id not in rsaf_laptops and asset_id not in a380_laptops and asset_id not in cannot_assign_laptops:
+            pools['General'].append((asset_id, fsa))
+    return pools
+
+
+def seat_laptop_pools(courses_df):
+    """
+    Returns the laptop pool of every seat: RSAF seats (99Y) draw from the RSAF laptops,
+    SIA A380 (L*) seats from the A380 laptops and all others from the General pool.
+    """
+    customers = courses_df['Customer']
+    return np.select(
+        [customers == '99Y', courses_df['Course Type'].str.startswith('L') & (customers == 'SIA')],
+        ['RSAF', 'A380'],
+        default='General'
+    )
+
+
+def assign_over_window(starts, ends, seat_pools, pool_devices):
+    """
+    Assigns devices to seats so that a device is only shared by seats whose dates do not
+    overlap; a device is free again from the day after the 'To' date of its seat.
+
+    Seats are taken in order of their end day, and each takes from its pool the device
+    that came back last before the seat starts, or else the first device of the pool
+    that has not been used yet. With disjoint pools this assigns the largest possible
+    number of seats in every pool (the classic interval scheduling greedy).
+
+    Args:
+        starts (array): Start day number of every seat.
+        ends (array): End day number of every seat.
+        seat_pools (array): Pool name of every seat, or None for seats that need no device.
+        pool_devices (dict): Pool name -> device IDs in priority order. A device may be
+            listed in several pools.
+
+    Returns:
+        list: The device ID for each seat, or None where its pool had no free device.
+    """
+    # Each pool is a sorted list of (day the device came back, -priority, device ID);
+    # unused devices come back on day 'never', so the first one in priority order sorts last
+    never = -2 ** 62
+    priority = {}
+    for devices in pool_devices.values():
+        for device in devices:
+            priority.setdefault(device, len(priority))
+    free = {pool: sorted((never, -priority[device], device) for device in dict.fromkeys(devices)) for pool, devices in pool_devices.items()}
+    device_pools = {}
+    for pool, devices in pool_devices.items():
+        for device in dict.fromkeys(devices):
+            device_pools.setdefault(device, []).append(pool)
+
+    device_ids = [None] * len(starts)
+    for position in np.lexsort((starts, ends)).tolist():
+        pool = seat_pools[position]
+        entries = free.get(pool)
+        if not entries:
+            continue
+
+        # The last entry that came back strictly before the seat starts
+        i = bisect_left(entries, (int(starts[position]),)) - 1
+        if i < 0:
+            continue
+        returned, rank, device = entries[i]
+        device_ids[position] = device
+
+        # Move the device to its new return day in every pool that lists it
+        for device_pool in device_pools[device]:
+            pool_entries = free[device_pool]
+            del pool_entries[bisect_left(pool_entries, (returned, rank, device))]
+            insort(pool_entries, (int(ends[position]), rank, device))
+    return device_ids
+
+
+def day_numbers(dates):
+    """
+    Returns the dates (datetimes, Timestamps or datetime.date values) as int64 day numbers.
+    """
+    dates = pd.Series(dates)
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+    return dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def allocate_laptops_window(courses_df, laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops):
+    """
+    Assigns laptops to course seats over the whole date window at once.
+
+    Unlike allocate_laptops, a laptop goes out again once the course that had it is over,
+    so later courses can reuse laptops from earlier ones that do not overlap them (see
+    assign_over_window). Pools and their priority order are the same as in allocate_laptops.
+
+    Args:
+        courses_df (DataFrame): Course seats with 'From', 'To', 'Customer' and 'Course Type'.
+        laptops_df (DataFrame): Assignable laptops in priority order, with 'Asset ID' and 'FSA'.
+
+    Returns:
+        tuple: (laptop IDs, FSA values), one entry per seat, None where the pool had no free laptop.
+    """
+    pools = laptop_pools(laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops)
+    fsa_by_laptop = {asset_id: fsa for laptops in pools.values() for asset_id, fsa in laptops}
+
+    laptop_ids = assign_over_window(
+        day_numbers(courses_df['From']),
+        day_numbers(courses_df['To']),
+        seat_laptop_pools(courses_df),
+        {pool: [asset_id for asset_id, _ in laptops] for pool, laptops in pools.items()}
+    )
+    return laptop_ids, [fsa_by_laptop[asset_id] if asset_id is not None else None for asset_id in laptop_ids]
+
+
+def allocate_ipads_window(courses_df, eligible_ipads):
+    """
+    Assigns iPads to the seats of E/G courses that are not RSAF (99Y), reusing an iPad once
+    the course that had it is over (see assign_over_window).
+
+    Returns:
+        list: The iPad ID for each seat, or None.
+    """
+    needs_ipad = courses_df['Course Type'].str[0].isin(['E', 'G']) & (courses_df['Customer'] != '99Y')
+
+    ipad_ids = assign_over_window(
+        day_numbers(courses_df['From']),
+        day_numbers(courses_df['To']),
+        np.where(needs_ipad.to_numpy(), 'iPad', None),
+        {'iPad': list(eligible_ipads)}
+    )
+
+    unassigned = int(needs_ipad.sum()) - sum(ipad is not None for ipad in ipad_ids)
+    if unassigned > 0:
+        print(f"No more iPads available for {unassigned} rows")
+    return ipad_ids
+
+
+def allocate_ipads(courses_df, eligible_ipads):
+    """
+    Assigns iPads, in order, to the seats of E/G courses that are not RSAF (99Y).
+
+    Returns:
+        list: The iPad ID for each seat, or None.
+    """
+    needs_ipad = courses_df['Course Type'].str[0].isin(['E', 'G']) & (courses_df['Customer'] != '99Y')
+
+    ipad_ids = [None] * len(courses_df)
+    positions = np.flatnonzero(needs_ipad.to_numpy())
+    for position, ipad in zip(positions, eligible_ipads):
+        ipad_ids[position] = ipad
+
+    unassigned = len(positions) - len(eligible_ipads)
+    if unassigned > 0:
+        print(f"No more iPads available for {unassigned} rows")  # Debug: Log when no iPads remain
+
+    return ipad_ids
+
+
+# Columns (lower-case) the overdue report needs; uploads without them are rejected
+REQUIRED_MYTEAM_COLUMNS = {'course', 'from', 'to', 'trainee firstname', 'trainee lastname',
+                           'course type name', 'seat number', 'customer', 'customer name'}
+REQUIRED_ASSETS_COLUMNS = {'location', 'asset id'}
+
+
+def missing_columns(df, required_columns):
+    """
+    Returns the required columns (lower-case) that df lacks, ignoring case and surrounding spaces.
+    """
+    return required_columns - {str(column).strip().lower() for column in df.columns}
+
+
+def process_overdue_devices_with_save(excel_file, csv_file, OD_Days, output_file="overdue_devices", return_report=False):
     """
     Processes the Excel and CSV files to identify overdue devices and save the results to an Excel file.
+    With return_report set, returns (path, report DataFrame) instead of just the path.
     """
     
     # Ensure OD_Days is an integer
@@ -212,20 +391,16 @@ def process_overdue_devices_with_save(excel_file, csv_file, OD_Days, output_file
             return
 
     # Load Excel and CSV files
-    excel_df = pd.read_excel(excel_file)
-    csv_df = pd.read_csv(csv_file)
+    excel_df = load_myteam(excel_file)
+    csv_df = load_assets(csv_file)
 
-    # Normalize column names
-    excel_df.columns = excel_df.columns.str.strip().str.lower()
-    csv_df.columns = csv_df.columns.str.strip().str.lower()
+    # Normalize column names (rename returns a copy, the shared frames stay untouched)
+    excel_df = excel_df.rename(columns=lambda column: column.strip().lower())
+    csv_df = csv_df.rename(columns=lambda column: column.strip().lower())
 
     # Check for required columns
-    required_columns_excel = {'course', 'from', 'to', 'trainee firstname', 'trainee lastname',
-                              'course type name', 'seat number', 'customer', 'customer name'}
-    required_columns_csv = {'location', 'asset id'}
-
-    missing_excel = required_columns_excel - set(excel_df.columns)
-    missing_csv = required_columns_csv - set(csv_df.columns)
+    missing_excel = missing_columns(excel_df, REQUIRED_MYTEAM_COLUMNS)
+    missing_csv = missing_columns(csv_df, REQUIRED_ASSETS_COLUMNS)
 
     if missing_excel:
         #print(f"Missing columns in Excel: {missing_excel}")
@@ -234,135 +409,43 @@ def process_overdue_devices_with_save(excel_file, csv_file, OD_Days, output_file
         #print(f"Missing columns in CSV: {missing_csv}")
         return
 
-    overdue_data = []
-
-    # Iterate through each row in the Excel workbook
-    for _, excel_row in excel_df.iterrows():
-        course = excel_row['course']
-        from_date = excel_row['from']
-        trainee_firstname = excel_row['trainee firstname']
-        trainee_lastname = excel_row['trainee lastname']
-        course_type_name = excel_row['course type name']
-        seat_number = excel_row['seat number']
-        customer = excel_row['customer']
-        customer_name = excel_row['customer name']
-
-        # Debugging: Check if the course exists in CSV
-        if course not in csv_df['location'].values:
-            #print(f"Course {course} not found in CSV.")
-            continue
-
-        # Find all instances of the 'Trainee Firstname' and 'Trainee Lastname' in the workbook
-        trainee_matches = excel_df[(
-            excel_df['trainee firstname'] == trainee_firstname) & 
-            (excel_df['trainee lastname'] == trainee_lastname)
-        ]
-
-        # Extract the 'To' dates and find the latest date
-        to_dates = []
-
-        # If there are no trainee matches, take the 'To' date from the current row
-        if trainee_matches.empty:
-            #print(f"No trainee matches for {trainee_firstname} {trainee_lastname} in course {course}. Using the 'To' date from the course.")
-            to_dates.append(excel_row['to'])
-        else:
-            for _, trainee_row in trainee_matches.iterrows():
-                to_date = trainee_row['to']
-                #print(f"Processing trainee {trainee_row['trainee firstname']} {trainee_row['trainee lastname']}, To Date: {to_date}")
-
-                # Handle both str and Timestamp types
-                if isinstance(to_date, pd.Timestamp):
-                    to_date = to_date.to_pydatetime()
-                elif isinstance(to_date, str):
-                    to_date = datetime.strptime(to_date, '%d-%b-%y')
-
-                to_dates.append(to_date)
-
-        if not to_dates:
-            #print(f"No 'To' dates found for course {course}")
-            continue
-
-        # Use the latest "To" date for overdue check
-        latest_to_date = max(to_dates)
-        #print(f"Latest To Date for course {course}: {latest_to_date}")
-
-        # If 'From' date and 'To' date are the same, treat them as the same date for overdue logic
-        if from_date == latest_to_date:
-            print(f"From date and To date are the same for course {course}, treating them as {from_date}")
-            latest_to_date = from_date
-
-        current_date = datetime.now()
-        #print(f"Current Date: {current_date}")
-        #print(f"Checking if course {course} is overdue, comparing to {latest_to_date + timedelta(days=OD_Days)}")
-
-        # Check if the current date is more than OD_Days after the latest 'To' date
-        if current_date > latest_to_date + timedelta(days=OD_Days):
-            #print(f"Course {course} is overdue.")
-            # Get asset IDs for the course
-            course_assets = csv_df[csv_df['location'] == course]['asset id'].tolist()
-            asset_ids_l = [aid for aid in course_assets if aid.startswith('L')]
-            asset_ids_a = [aid for aid in course_assets if aid.startswith('A')]
-
-            # If there are laptops, process them, even if there are no iPads
-            if asset_ids_l:
-                for laptop_id in asset_ids_l:
-                    if asset_ids_a:  # If iPads are available, pair them with laptops
-                        ipad_id = asset_ids_a.pop(0)  # Use the first available iPad
-                        overdue_data.append({
-                            'Course': course,
-                            'From': from_date,
-                            'To': latest_to_date,
-                            'Course Type Name': course_type_name,
-                            'Seat Number': '',
-                            'Customer': customer,
-                            'Customer Name': customer_name,
-                            'Trainee Firstname': '',
-                            'Trainee Lastname': '',
-                            'Staff ID (Lenovo Yoga)': laptop_id,  # Laptop ID
-                            'Staff ID (Apple iPad)': ipad_id     # iPad ID
-                        })
-                    else:  # If no iPads, just record the laptop
-                        overdue_data.append({
-                            'Course': course,
-                            'From': from_date,
-                            'To': latest_to_date,
-                            'Course Type Name': course_type_name,
-                            'Seat Number': '',
-                            'Customer': customer,
-                            'Customer Name': customer_name,
-                            'Trainee Firstname': '',
-                            'Trainee Lastname': '',
-                            'Staff ID (Lenovo Yoga)': laptop_id,  # Laptop ID
-                            'Staff ID (Apple iPad)': None        # No iPad
-                        })
-
-            # If there are only iPads (no laptops), process them separately
-            if asset_ids_a:
-                for ipad_id in asset_ids_a:
-                    overdue_data.append({
-                        'Course': course,
-                        'From': from_date,
-                        'To': latest_to_date,
-                        'Course Type Name': course_type_name,
-                        'Seat Number': '',
-                        'Customer': customer,
-                        'Customer Name': customer_name,
-                        'Trainee Firstname': '',
-                        'Trainee Lastname': '',
-                        'Staff ID (Lenovo Yoga)': None,  # No Laptop
-                        'Staff ID (Apple iPad)': ipad_id  # iPad ID
-                    })
-
-    # After gathering all data, we now need to remove duplicates based on 'Staff ID (Lenovo Yoga)'
-    if overdue_data:
-        #print(f"Overdue data collected: {len(overdue_data)} entries found.")
-        overdue_df = pd.DataFrame(overdue_data)
-    else:
+    # Latest 'To' date per trainee; rows without a trainee name keep their own 'To' date
+    to_dates = to_datetime_column(excel_df['to'])
+    latest_to_dates = to_dates.groupby([excel_df['trainee firstname'], excel_df['trainee lastname']]).transform('max')
+    latest_to_dates = latest_to_dates.fillna(to_dates)
+
+    # Check if the current date is more than OD_Days after the latest 'To' date
+    current_date = datetime.now()
+    overdue_mask = excel_df['course'].isin(csv_df['location']) & (current_date > latest_to_dates + timedelta(days=OD_Days))
+    overdue_courses = excel_df.loc[overdue_mask, ['course', 'from', 'course type name', 'customer', 'customer name']]
+    overdue_courses['to'] = latest_to_dates[overdue_mask]
+
+    # Every row of a course lists the same devices, and only the first listing of a laptop
+    # survives the drop_duplicates below, so the first overdue row per course is enough
+    overdue_courses = overdue_courses.drop_duplicates(subset='course', keep='first')
+    overdue_courses['row'] = range(len(overdue_courses))
+
+    # Pair each location's laptops with its iPads in file order; extra iPads get their own rows
+    course_assets = location_device_pairs(csv_df)
+    overdue_df = overdue_courses.merge(course_assets, left_on='course', right_on='location', how='inner')
+    overdue_df = overdue_df.sort_values(by=['row', 'ipad only', 'rank'], kind='stable')
+
+    overdue_df = pd.DataFrame({
+        'Course': overdue_df['course'],
+        'From': overdue_df['from'],
+        'To': overdue_df['to'],
+        'Course Type Name': overdue_df['course type name'],
+        'Seat Number': '',
+        'Customer': overdue_df['customer'],
+        'Customer Name': overdue_df['customer name'],
+        'Trainee Firstname': '',
+        'Trainee Lastname': '',
+        'Staff ID (Lenovo Yoga)': overdue_df['laptop id'].astype(object).where(overdue_df['laptop id'].notna(), None),
+        'Staff ID (Apple iPad)': overdue_df['ipad id'].astype(object).where(overdue_df['ipad id'].notna(), None)
+    }).reset_index(drop=True)
+
+    if overdue_df.empty:
         print("No overdue devices found.")
-        # Create an empty DataFrame with column headers
-        columns = ['Course', 'From', 'To', 'Course Type Name', 'Seat Number', 'Customer', 'Customer Name', 
-                   'Trainee Firstname', 'Trainee Lastname', 'Staff ID (Lenovo Yoga)', 'Staff ID (Apple iPad)']
-        overdue_df = pd.DataFrame(columns=columns)
 
     # Format 'From' and 'To' columns if there's data
     if not overdue_df.empty:
@@ -376,226 +459,401 @@ def process_overdue_devices_with_save(excel_file, csv_file, OD_Days, output_file
     temp_dir = tempfile.gettempdir()  # Get temporary directory path
     temp_file_path = os.path.join(temp_dir, f'{output_file}.xlsx')  # Define temp file path
 
-    with pd.ExcelWriter(temp_file_path, engine='openpyxl') as excel_writer:
-        overdue_df.to_excel(excel_writer, index=False)
+    # Borders and column widths only apply when there is data
+    with span('write_report'):
+        write_report(
+            overdue_df, temp_file_path, sheet_title='Sheet1', borders=not overdue_df.empty,
+            auto_width=not overdue_df.empty, header_format=True
+        )
+    print(f"Overdue devices saved to {temp_file_path} with borders and adjusted column widths.")
 
-        # Apply borders after writing the data
-        if not overdue_df.empty:
-            apply_all_borders(excel_writer.sheets['Sheet1'])
+    if return_report:
+        return temp_file_path, overdue_df
+    return temp_file_path  # Return the path of the saved file
 
-        # Adjust column widths if there's data
-        if not overdue_df.empty:
-            adjust_column_widths(excel_writer, overdue_df)
 
-        print(f"Overdue devices saved to {temp_file_path} with borders and adjusted column widths.")
-    
-    return temp_file_path  # Return the path of the saved file
 
 
+def to_datetime_column(dates):
+    """
+    Converts a MyTeam date column to datetimes, accepting Timestamps and '15-Jan-25' strings.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    dates = dates.map(lambda value: datetime.strptime(value, '%d-%b-%y') if isinstance(value, str) else value)
+    return pd.to_datetime(dates)
+
+
+def location_device_pairs(csv_df):
+    """
+    Lists the devices at each location the way the overdue report shows them.
+
+    Laptops (L*) are paired with iPads (A*) in file order; iPads left over after the pairing
+    get a row of their own. 'rank' is the position of the row within its location and
+    'ipad only' marks the rows without a laptop.
+
+    Args:
+        csv_df (DataFrame): Assets data with lower-case 'location' and 'asset id' columns.
+
+    Returns:
+        DataFrame: Columns 'location', 'rank', 'laptop id', 'ipad id' and 'ipad only'.
+    """
+    assets = csv_df[['location', 'asset id']]
+    laptops = assets[assets['asset id'].str.startswith('L', na=False)].rename(columns={'asset id': 'laptop id'})
+    ipads = assets[assets['asset id'].str.startswith('A', na=False)].rename(columns={'asset id': 'ipad id'})
+
+    laptops = laptops.assign(rank=laptops.groupby('location').cumcount())
+    ipads = ipads.assign(rank=ipads.groupby('location').cumcount())
+
+    pairs = laptops.merge(ipads, on=['location', 'rank'], how='outer')
+    pairs['ipad only'] = pairs['laptop id'].isna()
+    return pairs
+
+
+def build_course_locations(myteam_df, assets_df):
+    """
+    Builds the per-location table behind the 'Courses Ending' list.
+
+    Parameters:
+    - myteam_df (DataFrame): Data from the myteam Excel workbook.
+    - assets_df (DataFrame): Data from the assets CSV file.
+
+    Returns:
+    - dict: 'locations' (SIN location -> (Asset IDs, 'To' dates of the course's first trainee)),
+      'course_trainee' (Course -> Trainee Code of its first seat) and
+      'trainee_to_dates' (Trainee Code -> 'To' dates of every seat of that trainee).
+    """
+    courses = myteam_df.drop_duplicates(subset='Course')
+    to_dates = pd.Series(to_datetime_column(myteam_df['To']).to_numpy().astype('datetime64[D]'), index=myteam_df.index)
+
+    table = {
+        "locations": {},
+        "course_trainee": dict(zip(courses['Course'], courses['Trainee Code'])),
+        "trainee_to_dates": {code: dates.to_numpy() for code, dates in to_dates.groupby(myteam_df['Trainee Code'])}
+    }
+
+    sin_assets = assets_df[assets_df['Location'].str.startswith('SIN', na=False)]
+    for location, asset_ids in sin_assets.groupby('Location', sort=False)['Asset ID'].agg(list).items():
+        set_course_location(table, location, asset_ids)
+    return table
+
+
+def set_course_location(table, location, asset_ids):
+    """
+    Stores the assets of one SIN location in a course location table, or removes the
+    location if it has no assets or no matching course and trainee in MyTeam.
+    """
+    table["locations"].pop(location, None)
+    if not asset_ids:
+        return
+
+    # Match Location with Course in MyTeam, then find all 'To' dates of its first trainee
+    trainee_code = table["course_trainee"].get(location)
+    if trainee_code is None or trainee_code not in table["trainee_to_dates"]:
+        return
+    table["locations"][location] = (asset_ids, table["trainee_to_dates"][trainee_code])
+
 
+def update_course_locations(table, delta, assets_df):
+    """
+    Brings a course location table up to date with an assets delta (see datasets.ingest_assets),
+    recomputing only the locations the delta touched.
 
-def apply_all_borders(worksheet):
+    Returns a new table; the given one may still be read by other requests and is left as it is.
     """
-    Applies borders to all cells in the given worksheet.
+    table = dict(table, locations=dict(table["locations"]))
+    affected = [location for location in delta['locations'] if isinstance(location, str) and location.startswith('SIN')]
+    rows = assets_df[assets_df['Location'].isin(affected)]
+    asset_ids = rows.groupby('Location', sort=False)['Asset ID'].agg(list).to_dict()
+
+    for location in affected:
+        set_course_location(table, location, asset_ids.get(location))
+    return table
+
+
+def course_locations(assets_file, myteam_file):
+    """
+    Returns the course location table for the given files, kept up to date across assets uploads.
     """
-    thin_border = Border(
-        left=Side(border_style="thin"),
-        right=Side(border_style="thin"),
-        top=Side(border_style="thin"),
-        bottom=Side(border_style="thin")
+    return load_derived(
+        'course_locations',
+        [myteam_file, assets_file],
+        lambda: build_course_locations(load_myteam(myteam_file), load_assets(assets_file)),
+        updater=update_course_locations
     )
 
-    # Apply borders to all cells
-    for row in worksheet.iter_rows():
-        for cell in row:
-            cell.border = thin_border
 
-def adjust_column_widths(excel_writer, df):
+def build_course_end_dates(table):
+    """
+    Flattens a course location table into one array of candidate 'To' dates, sorted by date.
+
+    Returns:
+    - tuple: (dates, locations), where locations[i] is the SIN location dates[i] belongs to.
+    """
+    dates = []
+    locations = []
+    for location, (asset_ids, to_dates) in table["locations"].items():
+        to_dates = to_dates[~np.isnat(to_dates)]
+        dates.append(to_dates)
+        locations.append(np.full(len(to_dates), location, dtype=object))
+
+    if not dates:
+        return np.array([], dtype='datetime64[D]'), np.array([], dtype=object)
+
+    dates = np.concatenate(dates)
+    order = np.argsort(dates, kind='stable')
+    return dates[order], np.concatenate(locations)[order]
+
+
+def course_endings(assets_file, myteam_file, end_date):
     """
-    Adjusts the column widths in the Excel file to fit the largest value in each column.
-    This mimics the 'double-click to auto-resize' behavior.
+    Finds the SIN locations whose trainee has a 'To' date between today and end_date.
+
+    The sorted date array is built once per dataset version, so each query is two bisections
+    and a slice.
+
+    Returns:
+        list: (Course, latest 'To' date in range, Asset IDs) tuples, ordered by that date.
     """
-    workbook = excel_writer.book
-    worksheet = workbook.active
+    table = course_locations(assets_file, myteam_file)
+    dates, locations = load_derived(
+        'course_end_dates',
+        [myteam_file, assets_file],
+        lambda: build_course_end_dates(table)
+    )
+
+    today = np.datetime64(datetime.now().date(), 'D')
+    start = np.searchsorted(dates, today, side='left')
+    stop = np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right')
 
-    for col in worksheet.columns:
-        max_length = 0
-        column = col[0].column_letter  # Get the column name (A, B, C, ...)
-        for cell in col:
-            value = str(cell.value)  # Convert to string to handle date and text uniformly
-            if len(value) > max_length:
-                max_length = len(value)
-        adjusted_width = (max_length + 2)  # Add a bit of padding for better appearance
-        worksheet.column_dimensions[column].width = adjusted_width
+    # The slice is sorted by date, so the last date seen for a location is its latest one
+    latest = dict(zip(locations[start:stop], dates[start:stop]))
+    return [
+        (location, to_date, table["locations"][location][0])
+        for location, to_date in sorted(latest.items(), key=lambda item: (item[1], item[0]))
+    ]
 
 
 def process_course_data_with_date_filter(assets_file, myteam_file, end_date):
     """
     Process the assets and MyTeam files to find courses, their 'To' dates, and associated assets
-    within the range of today to this Thursday (exclusive), ordered by the latest 'To' date.
+    within the range of today to end_date, ordered by the latest 'To' date.
 
     Args:
         assets_file (str): Path to the assets CSV file.
         myteam_file (str): Path to the MyTeam Excel file.
+        end_date (date): Last 'To' date to include.
 
     Returns:
         list: A list of strings in the format 'Course - To - Asset ID', with dates in '15 Jan 2025' format.
+
+    Errors reading the files propagate, so callers can decide not to cache a failed table.
     """
-    try:
-        # Get today's date and calculate this Thursday's date
-        today = datetime.now().date()
-        days_until_friday = (4 - today.weekday() + 7) % 7  # 0 = Monday, 6 = Sunday
-        this_friday = today + timedelta(days=days_until_friday)
-        this_thursday = this_friday - timedelta(days=1)  # Exclude Friday
+    return [
+        f"{course} - {pd.Timestamp(to_date).strftime('%d %b %Y')} - {', '.join(asset_ids)}"
+        for course, to_date, asset_ids in course_endings(assets_file, myteam_file, end_date)
+    ]
 
-        # Load assets file
-        assets_df = pd.read_csv(assets_file)
 
-        # Filter locations starting with 'SIN'
-        sin_assets = assets_df[assets_df['Location'].str.startswith('SIN', na=False)]
+def build_monthly_device_counts(df, include_course_types):
+    """
+    Counts laptops, iPads and seats per aircraft type for every month in a single scan.
 
-        # Extract relevant data
-        location_to_assets = sin_assets.groupby('Location')['Asset ID'].apply(list).to_dict()
+    Laptops: every V*, L*, E* and G* seat. iPads: E* and G* seats, except RSAF (99Y) G* seats.
+    Fleet: E* -> A320, G* -> A330, V* -> A350, L* -> A380.
 
-        # Load MyTeam file
-        myteam_df = pd.read_excel(myteam_file)
+    Args:
+        df (DataFrame): Data from the MyTeam workbook.
+        include_course_types (list): Course types to count.
 
-        # Initialize results
-        results = []
+    Returns:
+        DataFrame: One row per month in date order, with 'Month' ('October 2024'), 'Laptops',
+        'iPads', 'A320', 'A330', 'A350' and 'A380' columns.
+    """
+    # Filter courses where 'Course Type' is in the include_course_types list
+    courses = df[df['Course Type'].isin(include_course_types)]
+    first_letter = courses['Course Type'].astype(str).str[0]
+    needs_laptop, needs_ipad = seat_device_needs(courses)
+
+    counts = pd.DataFrame({
+        'YearMonth': pd.to_datetime(courses['From'], errors='coerce').dt.to_period('M'),
+        'Laptops': needs_laptop,
+        'iPads': needs_ipad,
+        'A320': first_letter == 'E',
+        'A330': first_letter == 'G',
+        'A350': first_letter == 'V',
+        'A380': first_letter == 'L'
+    })
+    counts = counts.groupby('YearMonth').sum().astype(int).sort_index()
+
+    # Format the month as "Month Year"
+    counts.insert(0, 'Month', counts.index.to_timestamp().strftime("%B %Y"))
+    return counts.reset_index(drop=True)
+
+
+def seat_device_needs(courses):
+    """
+    Returns two boolean Series: the seats that need a laptop (V*, L*, E* and G* course types)
+    and the seats that need an iPad (E* and G*, except RSAF (99Y) G* seats).
+    """
+    first_letter = courses['Course Type'].astype(str).str[0]
+    needs_laptop = first_letter.isin(['V', 'L', 'E', 'G'])
+    needs_ipad = first_letter.isin(['E', 'G']) & ~((courses['Customer'] == '99Y') & (first_letter == 'G'))
+    return needs_laptop, needs_ipad
 
-        # Process each SIN location
-        for location, asset_ids in location_to_assets.items():
-            # Match Location with Course in MyTeam
-            course_row = myteam_df[myteam_df['Course'] == location]
-            if course_row.empty:
-                continue
 
-            # Extract Trainee Code
-            trainee_code = course_row['Trainee Code'].iloc[0]
+def monthly_device_counts(file_path, include_course_types):
+    """
+    Returns build_monthly_device_counts for a MyTeam file, computed once per dataset version,
+    or None if the 'Course Type' or 'From' column is missing.
+    """
+    df = load_myteam(file_path)
 
-            # Find all instances of Trainee Code
-            trainee_rows = myteam_df[myteam_df['Trainee Code'] == trainee_code]
+    # Ensure that 'Course Type' and 'From' columns exist in the dataframe
+    if 'Course Type' not in df.columns or 'From' not in df.columns:
+        return None
 
-            # Extract the 'To' dates and find the latest date within the range
-            to_dates = []
+    return load_derived(
+        ('monthly_device_counts', tuple(include_course_types)),
+        [file_path],
+        lambda: build_monthly_device_counts(df, include_course_types)
+    )
 
-            for _, trainee_row in trainee_rows.iterrows():
-                to_date = trainee_row['To']
-                # Handle different types for 'To' column
-                if isinstance(to_date, pd.Timestamp):
-                    to_date = to_date.date()  # Convert to datetime.date
-                elif isinstance(to_date, str):
-                    to_date = datetime.strptime(to_date, '%d-%b-%y').date()  # Convert to datetime.date
-                # Only add to the list if the 'To' date is within the valid range
-                if today <= to_date <= end_date:
-                    to_dates.append(to_date)
 
-            if not to_dates:
-                continue
-            # Use the latest "To" date from the list of 'To' dates within the valid range
-            latest_to_date = max(to_dates)
+def count_courses_per_month(file_path, include_course_types):
+    counts = monthly_device_counts(file_path, include_course_types)
+    if counts is None:
+        return "Required columns ('Course Type', 'From') are missing from the data."
 
-            # Format the date as '15 Jan 2025'
-            formatted_date = latest_to_date.strftime('%d %b %Y')
+    # Format: 'October 2024: 6 0'
+    return [f"{month}: {laptops} {ipads}" for month, laptops, ipads in zip(counts['Month'], counts['Laptops'], counts['iPads'])]
 
-            # Compile the result
-            asset_ids_str = ', '.join(asset_ids)
-            results.append((location, formatted_date, asset_ids_str))
+# Donut chart categories, in display order
+LAPTOP_INVENTORY_CATEGORIES = ['Standard', 'Ongoing Course', 'RSAF Laptops', 'A380 Laptops']
+IPAD_INVENTORY_CATEGORIES = ['M01-13', 'Ongoing Course']
 
-        # Sort results by the earliest 'To' date
-        results.sort(key=lambda x: datetime.strptime(x[1], '%d %b %Y'))  # Sort by the date
 
-        # Convert to formatted strings for output
-        formatted_results = [f"{course} - {to_date} - {assets}" for course, to_date, assets in results]
+def build_inventory_counts(assets_df, rsaf_laptops, a380_laptops, cannot_assign_laptops):
+    """
+    Counts the Ready laptops and iPads of the assets export per donut chart category.
 
-        return formatted_results
+    Laptops in cannot_assign_laptops are left out. RSAF and A380 laptops are only counted
+    as such while they are in M01-13; other laptops in M01-13 are 'Standard' and devices
+    at a SIN* location are 'Ongoing Course'.
 
-    except Exception as e:
-        print(f"Error processing files: {e}")
-        return []
+    Returns:
+        dict: {'laptops': {category: count}, 'ipads': {category: count}}
+    """
+    asset_ids = assets_df['Asset ID'].astype(str)
+    location = assets_df['Location']
+    ready = (assets_df['Status'] == 'Ready').to_numpy()
+    in_store = (location == 'M01-13').to_numpy()
+    on_course = location.astype(str).str.startswith('SIN').to_numpy()
+
+    # One set lookup per asset instead of a scan of the config lists
+    excluded = asset_ids.isin(frozenset(cannot_assign_laptops)).to_numpy()
+    rsaf = asset_ids.isin(frozenset(rsaf_laptops)).to_numpy()
+    a380 = asset_ids.isin(frozenset(a380_laptops)).to_numpy()
+
+    is_laptop = asset_ids.str.startswith('L').to_numpy() & ready
+    laptop_category = np.select(
+        [excluded, rsaf & in_store, a380 & in_store, in_store, on_course],
+        ['', 'RSAF Laptops', 'A380 Laptops', 'Standard', 'Ongoing Course'],
+        default=''
+    )[is_laptop]
+
+    is_ipad = asset_ids.str.startswith('A').to_numpy() & ready
+    ipad_category = np.select([in_store, on_course], ['M01-13', 'Ongoing Course'], default='')[is_ipad]
+
+    laptop_counts = pd.Series(laptop_category).value_counts()
+    ipad_counts = pd.Series(ipad_category).value_counts()
+    return {
+        'laptops': {category: int(laptop_counts.get(category, 0)) for category in LAPTOP_INVENTORY_CATEGORIES},
+        'ipads': {category: int(ipad_counts.get(category, 0)) for category in IPAD_INVENTORY_CATEGORIES}
+    }
 
 
-def count_courses_per_month(file_path, include_course_types):
-    # Load the Excel file (assuming it contains a sheet with course data)
-    df = pd.read_excel(file_path)
-    
-    # Ensure that 'Course Type' and 'From' columns exist in the dataframe
-    if 'Course Type' not in df.columns or 'From' not in df.columns:
-        return "Required columns ('Course Type', 'From') are missing from the data."
-    
-    # Filter courses where 'Course Type' is in the include_course_types list
-    filtered_courses = df[df['Course Type'].isin(include_course_types)].copy()
-    
-    # Convert 'From' to datetime format if it's not already
-    filtered_courses['From'] = pd.to_datetime(filtered_courses['From'], errors='coerce')
-    
-    # Extract the Year-Month period from the 'From' column
-    filtered_courses['YearMonth'] = filtered_courses['From'].dt.to_period('M')
-    
-    # Initialize counters for laptops and iPads per month
-    monthly_counts = {}
-
-    # Loop through filtered data and count based on the rules
-    for _, row in filtered_courses.iterrows():
-        # Extract the relevant data
-        course_type = row['Course Type']
-        customer = row['Customer']
-        year_month = row['YearMonth']
-        
-        # Initialize the counts for the month if not already in the dictionary
-        if year_month not in monthly_counts:
-            monthly_counts[year_month] = {'Laptops': 0, 'iPads': 0}
-        
-        # Count Laptops and iPads based on Course Type and Customer
-        if course_type.startswith(('V', 'L')):
-            monthly_counts[year_month]['Laptops'] += 1
-        elif course_type.startswith(('E', 'G')):
-            if customer == '99Y' and course_type.startswith('G'):
-                monthly_counts[year_month]['Laptops'] += 1
-            else:
-                monthly_counts[year_month]['Laptops'] += 1
-                monthly_counts[year_month]['iPads'] += 1
-    
-    # Sort the months and print the results
-    results = []  # List to store the results
-        
-    sorted_months = sorted(monthly_counts.keys())
-        
-    for month in sorted_months:
-        laptops_count = monthly_counts[month]['Laptops']
-        ipads_count = monthly_counts[month]['iPads']
-            
-        # Format the month as "Month Year" using .to_timestamp() and .strftime()
-        formatted_month = month.to_timestamp().strftime("%B %Y")
-            
-        # Add the formatted result to the list
-        results.append(f"{formatted_month}: {laptops_count} {ipads_count}")
-        
-    # Return the list of results
-    return results
+def inventory_counts(assets_file, rsaf_laptops, a380_laptops, cannot_assign_laptops):
+    """
+    Returns build_inventory_counts for an assets file, computed once per dataset version and laptop lists.
+    """
+    return load_derived(
+        ('inventory_counts', tuple(rsaf_laptops), tuple(a380_laptops), tuple(cannot_assign_laptops)),
+        [assets_file],
+        lambda: build_inventory_counts(load_assets(assets_file), rsaf_laptops, a380_laptops, cannot_assign_laptops)
+    )
 
-def process_device_info(myteam_df, assets_df, device_id):
+
+def build_device_index(myteam_df, assets_df):
     """
-    Processes and retrieves information about a device, including its location,
-    course completion percentage, and related assets in the same location.
+    Builds the lookup tables used to answer device searches without scanning the data.
 
     Parameters:
     - myteam_df (DataFrame): Data from the myteam Excel workbook.
     - assets_df (DataFrame): Data from the assets CSV file.
-    - device_id (str): The Asset ID to look up.
 
     Returns:
-    - dict: A dictionary containing the device information, or an error message.
+    - dict: 'asset_location' (Asset ID -> Location), 'location_assets' (Location -> [Asset IDs]),
+      'course_start' (Course -> (From, Trainee Code)) and 'trainee_latest_to' (Trainee Code -> latest 'To').
+    """
+    courses = myteam_df.drop_duplicates(subset='Course')
+
+    return {
+        "asset_location": assets_df.drop_duplicates(subset='Asset ID').set_index('Asset ID')['Location'].to_dict(),
+        "location_assets": assets_df.groupby('Location', sort=False)['Asset ID'].agg(list).to_dict(),
+        "course_start": dict(zip(courses['Course'], zip(courses['From'], courses['Trainee Code']))),
+        "trainee_latest_to": pd.to_datetime(myteam_df['To']).groupby(myteam_df['Trainee Code']).max().to_dict()
+    }
+
+
+def update_device_index(index, delta, assets_df):
+    """
+    Brings a device index up to date with an assets delta (see datasets.ingest_assets),
+    regrouping only the locations the delta touched.
+
+    Returns a new index; the given one may still be read by other requests and is left as it is.
     """
-    assets_df = pd.read_csv(assets_df)
-    myteam_df = pd.read_excel(myteam_df)
-    # Search for the device in the assets file
-    device_row = assets_df[assets_df['Asset ID'] == device_id]
+    index = dict(index, asset_location=dict(index["asset_location"]), location_assets=dict(index["location_assets"]))
+
+    # An Asset ID can be shared by several rows; the first one wins, as in build_device_index
+    touched_ids = delta['added'] + delta['removed'] + list(delta['changed'])
+    touched = assets_df[assets_df['Asset ID'].isin(touched_ids)].drop_duplicates(subset='Asset ID')
+    for asset_id in touched_ids:
+        index["asset_location"].pop(asset_id, None)
+    index["asset_location"].update(zip(touched['Asset ID'], touched['Location']))
+
+    rows = assets_df[assets_df['Location'].isin(delta['locations'])]
+    location_assets = rows.groupby('Location', sort=False)['Asset ID'].agg(list).to_dict()
+    for location in delta['locations']:
+        if location in location_assets:
+            index["location_assets"][location] = location_assets[location]
+        else:
+            index["location_assets"].pop(location, None)
+    return index
+
+
+def device_index(myteam_file, assets_file):
+    """
+    Returns the device index for the given files, kept up to date across assets uploads.
+    """
+    return load_derived(
+        'device_index',
+        [myteam_file, assets_file],
+        lambda: build_device_index(load_myteam(myteam_file), load_assets(assets_file)),
+        updater=update_device_index
+    )
 
-    if device_row.empty:
+
+def lookup_device(index, device_id, today=None):
+    """
+    Answers a device search from a device index (see build_device_index).
+
+    The completion percentage is measured on today, which defaults to now.
+    """
+    if device_id not in index["asset_location"]:
         return {"error": f"Device ID {device_id} not found in the assets file."}
 
-    location = device_row.iloc[0]['Location']
+    location = index["asset_location"][device_id]
     if not location.startswith("SIN"):
         return {
             "Asset ID": device_id,
@@ -605,29 +863,28 @@ def process_device_info(myteam_df, assets_df, device_id):
             "Completion Percentage": 0,
             "Other Asset IDs": []
         }
-    
+
     # Find the corresponding course in the myteam file
-    course_row = myteam_df[myteam_df['Course'] == location]
-    if course_row.empty:
+    if location not in index["course_start"]:
         return {"error": f"Location {location} not found in the myteam file."}
 
-    # Extract 'From' and 'Trainee Code'
-    from_date = course_row.iloc[0]['From']
-    trainee_code = course_row.iloc[0]['Trainee Code']
-
-    # Find all 'To' dates for the same Trainee Code
-    trainee_rows = myteam_df[myteam_df['Trainee Code'] == trainee_code]
-    to_dates = pd.to_datetime(trainee_rows['To'])
-    max_to_date = to_dates.max()
+    # Extract 'From' and 'Trainee Code', then the latest 'To' date for the same Trainee Code
+    from_date, trainee_code = index["course_start"][location]
+    max_to_date = index["trainee_latest_to"].get(trainee_code, pd.NaT)
 
     # Calculate completion percentage
-    today = datetime.now()
+    if today is None:
+        today = datetime.now()
     from_date = pd.to_datetime(from_date)
-    completion_percentage = ((today - from_date).days / (max_to_date - from_date).days) * 100
+    if max_to_date <= from_date:
+        # A single-day course has no length to measure progress against
+        completion_percentage = 100
+    else:
+        completion_percentage = ((today - from_date).days / (max_to_date - from_date).days) * 100
     if completion_percentage > 100:
         completion_percentage = 100
     # Find other Asset IDs with the same location
-    same_location_assets = assets_df[assets_df['Location'] == location]['Asset ID'].tolist()
+    same_location_assets = list(index["location_assets"][location])
     same_location_assets.remove(device_id)  # Exclude the input device ID
 
     # Return the result as a dictionary
@@ -640,63 +897,358 @@ def process_device_info(myteam_df, assets_df, device_id):
         "Other Asset IDs": same_location_assets
     }
 
+
+def process_device_info(myteam_df, assets_df, device_id):
+    """
+    Processes and retrieves information about a device, including its location,
+    course completion percentage, and related assets in the same location.
+
+    Parameters:
+    - myteam_df (str): Path to the myteam Excel workbook.
+    - assets_df (str): Path to the assets CSV file.
+    - device_id (str): The Asset ID to look up.
+
+    Returns:
+    - dict: A dictionary containing the device information, or an error message.
+    """
+    return lookup_device(device_index(myteam_df, assets_df), device_id)
+
+
+def lookup_device_as_of(index, states, device_id, when):
+    """
+    Answers a device search as it would have been answered at an earlier time.
+
+    Parameters:
+    - index (dict): A device index (see build_device_index); only its course tables are used.
+    - states (dict): Asset ID -> (Location, Status) at that time (see store.asset_states).
+    - device_id (str): The Asset ID to look up.
+    - when (datetime): The time the search is answered for.
+
+    Returns:
+    - dict: The same layout as lookup_device.
+    """
+    location_assets = {}
+    for asset_id, (location, status) in states.items():
+        location_assets.setdefault(location, []).append(asset_id)
+
+    index = dict(index, asset_location={asset_id: location for asset_id, (location, status) in states.items()}, location_assets=location_assets)
+    return lookup_device(index, device_id, today=when)
+
+
+def process_devices_info(myteam_file, assets_file, device_ids):
+    """
+    Batch variant of process_device_info for barcode-scanner sweeps.
+
+    Returns:
+    - list: One result dictionary per device ID, in the order given.
+    """
+    index = device_index(myteam_file, assets_file)
+    return [lookup_device(index, device_id) for device_id in device_ids]
+
+
+# Return day of the devices that are in the store room already
+IN_STORE_DAY = -2 ** 62
+
+# Availability calendar device kinds -> their allocation pools (see laptop_pools and process_excel)
+DEVICE_KINDS = {'laptops': ('General', 'RSAF', 'A380'), 'ipads': ('iPad',)}
+
+
+def build_availability_calendar(myteam_df, assets_df):
+    """
+    Builds the availability calendar: the days every device is out with a course.
+
+    Devices in M01-13 are free now. A device at a SIN location is out with that course
+    from the course's first 'From' date until the latest 'To' date of the course's first
+    trainee, as in the device search, and free again from the day after. Devices anywhere
+    else, or at a SIN location with no matching course, have no known return day.
+
+    Parameters:
+    - myteam_df (DataFrame): Data from the myteam Excel workbook.
+    - assets_df (DataFrame): Data from the assets CSV file.
+
+    Returns:
+    - dict: 'course_return' and 'course_start' (Course -> return / first day number),
+      'device_return' (Asset ID -> (Location, return day number or None)), 'device_kind'
+      (Asset ID -> kind, for the devices the allocator can hand out) and 'kinds' (see
+      return_day_arrays).
+    """
+    courses = myteam_df.drop_duplicates(subset='Course')
+    latest_to = pd.to_datetime(myteam_df['To']).groupby(myteam_df['Trainee Code']).max()
+    course_to = courses['Trainee Code'].map(latest_to)
+    known = course_to.notna().to_numpy()
+    first_from = pd.to_datetime(myteam_df['From']).groupby(myteam_df['Course']).min()
+
+    calendar = {
+        "course_return": dict(zip(courses['Course'][known], (day_numbers(course_to[known]) + 1).tolist())),
+        "course_start": dict(zip(first_from.index[first_from.notna()], day_numbers(first_from.dropna()).tolist())),
+        "device_return": {},
+        "device_kind": {}
+    }
+    set_device_returns(calendar, assets_df.drop_duplicates(subset='Asset ID'))
+    calendar["kinds"] = return_day_arrays(calendar)
+    return calendar
+
+
+def set_device_returns(calendar, assets_df):
+    """
+    Stores the location and return day of every asset in assets_df in an availability calendar,
+    and the kind of the Ready ones the allocator can hand out: laptops with an FSA and iPads,
+    as in process_excel.
+    """
+    course_return = calendar["course_return"]
+    asset_ids = assets_df['Asset ID'].astype(str)
+    ready = assets_df['Status'] == 'Ready'
+    fsa = assets_df['FSA']
+    kinds = np.select(
+        [ready & asset_ids.str.startswith('L') & fsa.notna() & (fsa != 'NIL'), ready & asset_ids.str.startswith('AIP')],
+        ['laptops', 'ipads'],
+        default=''
+    )
+    for asset_id, location, kind in zip(assets_df['Asset ID'].tolist(), assets_df['Location'].tolist(), kinds.tolist()):
+        if location == 'M01-13':
+            return_day = IN_STORE_DAY
+        elif isinstance(location, str) and location.startswith('SIN'):
+            return_day = course_return.get(location)
+        else:
+            return_day = None
+        calendar["device_return"][asset_id] = (location, return_day)
+        if kind:
+            calendar["device_kind"][asset_id] = kind
+
+
+def return_day_arrays(calendar):
+    """
+    Sorts the devices the allocator can hand out by return day, and the ones out with a course
+    by the course's first day, per device kind.
+
+    Returns:
+        dict: Kind -> (int64 array of return day numbers in ascending order, Asset IDs in the same order,
+        int64 array of course first day numbers in ascending order, Asset IDs in the same order).
+    """
+    course_start = calendar["course_start"]
+    returns = {kind: [] for kind in DEVICE_KINDS}
+    starts = {kind: [] for kind in DEVICE_KINDS}
+    for asset_id, kind in calendar["device_kind"].items():
+        location, return_day = calendar["device_return"][asset_id]
+        if return_day is None:
+            continue
+        returns[kind].append((return_day, asset_id))
+        if return_day != IN_STORE_DAY and location in course_start:
+            starts[kind].append((course_start[location], asset_id))
+
+    kinds = {}
+    for kind in DEVICE_KINDS:
+        returns[kind].sort()
+        starts[kind].sort()
+        kinds[kind] = (
+            np.array([day for day, _ in returns[kind]], dtype=np.int64),
+            np.array([asset_id for _, asset_id in returns[kind]], dtype=object),
+            np.array([day for day, _ in starts[kind]], dtype=np.int64),
+            np.array([asset_id for _, asset_id in starts[kind]], dtype=object)
+        )
+    return kinds
+
+
+def update_availability_calendar(calendar, delta, assets_df):
+    """
+    Brings an availability calendar up to date with an assets delta (see datasets.ingest_assets),
+    looking up only the devices the delta touched.
+
+    Returns a new calendar; the given one may still be read by other requests and is left as it is.
+    """
+    calendar = dict(calendar, device_return=dict(calendar["device_return"]), device_kind=dict(calendar["device_kind"]))
+
+    # An Asset ID can be shared by several rows; the first one wins, as in build_availability_calendar
+    touched_ids = delta['added'] + delta['removed'] + list(delta['changed'])
+    for asset_id in touched_ids:
+        calendar["device_return"].pop(asset_id, None)
+        calendar["device_kind"].pop(asset_id, None)
+    set_device_returns(calendar, assets_df[assets_df['Asset ID'].isin(touched_ids)].drop_duplicates(subset='Asset ID'))
+    calendar["kinds"] = return_day_arrays(calendar)
+    return calendar
+
+
+def availability_calendar(myteam_file, assets_file):
+    """
+    Returns the availability calendar for the given files, kept up to date across assets uploads.
+    """
+    return load_derived(
+        'availability_calendar',
+        [myteam_file, assets_file],
+        lambda: build_availability_calendar(load_myteam(myteam_file), load_assets(assets_file)),
+        updater=update_availability_calendar
+    )
+
+
+def device_pool(kind, pool, rsaf_laptops, a380_laptops, cannot_assign_laptops, cannot_assign_ipads):
+    """
+    Returns (included, excluded) Asset IDs of one allocation pool of a device kind, as in
+    laptop_pools and process_excel; included is None when every device not excluded is in it.
+    """
+    if kind == 'ipads':
+        return None, frozenset(cannot_assign_ipads)
+    if pool == 'RSAF':
+        return frozenset(rsaf_laptops), frozenset()
+    if pool == 'A380':
+        return frozenset(a380_laptops), frozenset()
+    return None, frozenset(rsaf_laptops) | frozenset(a380_laptops) | frozenset(cannot_assign_laptops)
+
+
+def free_devices(calendar, start_date, end_date, kind='laptops', included=None, excluded=frozenset()):
+    """
+    Lists the devices of one kind that are free for the whole of start_date to end_date.
+
+    A device is only ever out with its current course, from the course's first 'From' date
+    to its return day, so it is free for the period if it is back in the store room by
+    start_date or its course only starts after end_date. The answer is two bisections of the
+    sorted return and start days and two slices.
+
+    Args:
+        calendar (dict): An availability calendar (see build_availability_calendar).
+        start_date (date): First day the devices are needed.
+        end_date (date): Last day the devices are needed.
+        kind (str): One of DEVICE_KINDS.
+        included, excluded: Asset IDs of the allocation pool to list (see device_pool).
+
+    Returns:
+        list: Asset IDs, devices already in the store room first, then by return day, then
+        the devices whose course starts after end_date, by start day.
+    """
+    if end_date < start_date:
+        raise ValueError("The end date is before the start date.")
+
+    return_days, asset_ids, start_days, starting_ids = calendar["kinds"][kind]
+    stop = np.searchsorted(return_days, np.datetime64(start_date, 'D').astype(np.int64), side='right')
+    begin = np.searchsorted(start_days, np.datetime64(end_date, 'D').astype(np.int64), side='right')
+    devices = dict.fromkeys(asset_ids[:stop].tolist() + starting_ids[begin:].tolist())
+    return [
+        asset_id for asset_id in devices
+        if (included is None or asset_id in included) and asset_id not in excluded
+    ]
+
+
+def device_return(calendar, device_id):
+    """
+    Answers 'when is this device back in the store room' from an availability calendar.
+    """
+    if device_id not in calendar["device_return"]:
+        return {"error": f"Device ID {device_id} not found in the assets file."}
+
+    location, return_day = calendar["device_return"][device_id]
+    if return_day is None:
+        returns = ""
+    elif return_day == IN_STORE_DAY:
+        returns = "In store"
+    else:
+        returns = pd.Timestamp(np.datetime64(return_day, 'D')).strftime('%d %b %Y')
+
+    return {
+        "Asset ID": device_id,
+        "Location": location,
+        "Returns": returns
+    }
+
+
+def build_shortfall_forecast(myteam_df, assets_df, calendar, inventory, include_course_types, cannot_assign_laptops, start_date, days):
+    """
+    Projects how many laptops and iPads are left in the store room on each of the next days.
+
+    Supply is the Ready stock in M01-13 today, in the donut chart categories, plus the Ready
+    devices at SIN locations ('Ongoing Course') from their return day in the availability
+    calendar; devices whose course is already over count from start_date. Demand is every
+    seat of an included course type starting on or after start_date, with the laptop and
+    iPad rules of build_monthly_device_counts. A seat takes its devices on its 'From' date
+    and gives them back the day after its 'To' date.
+
+    The balance is a cumulative sum over per-day counts, so the cost grows with the number
+    of seats and days, not with their product.
+
+    Args:
+        myteam_df (DataFrame): Data from the MyTeam workbook.
+        assets_df (DataFrame): Data from the assets export.
+        calendar (dict): Availability calendar of the same files (see build_availability_calendar).
+        inventory (dict): Inventory counts of the assets export (see build_inventory_counts).
+        include_course_types (list): Course types to count.
+        cannot_assign_laptops (list): Laptops left out of the supply.
+        start_date (date): First day of the forecast.
+        days (int): Number of days to forecast.
+
+    Returns:
+        dict: 'dates' (ISO dates) and, for 'laptops' and 'ipads', 'in_store' (stock today),
+        'available' and 'shortfall' (one value per day) and 'first_shortfall' (ISO date or None).
+    """
+    first_day = np.datetime64(start_date, 'D').astype(np.int64)
+
+    def per_day(day_numbers):
+        # Events before start_date happen on its first day, events after the horizon never
+        offsets = day_numbers - first_day
+        return np.bincount(np.clip(offsets[offsets < days], 0, None), minlength=days)
+
+    # Return day of every Ready device out on a course, in the donut chart's 'Ongoing Course' category
+    return_days = pd.Series({asset_id: return_day for asset_id, (location, return_day) in calendar["device_return"].items()}, dtype=object)
+    asset_ids = assets_df['Asset ID'].astype(str)
+    on_course = (assets_df['Status'] == 'Ready') & assets_df['Location'].astype(str).str.startswith('SIN')
+    returning = {
+        'laptops': on_course & asset_ids.str.startswith('L') & ~asset_ids.isin(frozenset(cannot_assign_laptops)),
+        'ipads': on_course & asset_ids.str.startswith('A')
+    }
+
+    # Seats of courses that have not started yet; running courses already have their devices
+    courses = myteam_df[myteam_df['Course Type'].isin(include_course_types)]
+    from_days = day_numbers(courses['From'])
+    to_days = day_numbers(courses['To'])
+    upcoming = (from_days >= first_day) & (to_days >= from_days)
+    needs_laptop, needs_ipad = seat_device_needs(courses)
+    needs = {'laptops': needs_laptop.to_numpy() & upcoming, 'ipads': needs_ipad.to_numpy() & upcoming}
+
+    in_store = {
+        'laptops': inventory['laptops']['Standard'] + inventory['laptops']['RSAF Laptops'] + inventory['laptops']['A380 Laptops'],
+        'ipads': inventory['ipads']['M01-13']
+    }
+
+    dates = np.arange(first_day, first_day + days).astype('datetime64[D]')
+    forecast = {'dates': [str(day) for day in dates]}
+    for kind in ('laptops', 'ipads'):
+        known_returns = return_days.reindex(asset_ids[returning[kind]]).dropna().to_numpy(dtype=np.int64)
+        seats = needs[kind]
+        available = in_store[kind] + np.cumsum(
+            per_day(known_returns) - per_day(from_days[seats]) + per_day(to_days[seats] + 1)
+        )
+        shortfall = np.maximum(-available, 0)
+        short_days = np.flatnonzero(shortfall)
+        forecast[kind] = {
+            'in_store': int(in_store[kind]),
+            'available': available.tolist(),
+            'shortfall': shortfall.tolist(),
+            'first_shortfall': str(dates[short_days[0]]) if len(short_days) else None
+        }
+    return forecast
+
+
+def shortfall_forecast(myteam_file, assets_file, include_course_types, rsaf_laptops, a380_laptops, cannot_assign_laptops, start_date, days):
+    """
+    Returns build_shortfall_forecast for the given files, reusing their cached availability
+    calendar and inventory counts.
+    """
+    return build_shortfall_forecast(
+        load_myteam(myteam_file),
+        load_assets(assets_file),
+        availability_calendar(myteam_file, assets_file),
+        inventory_counts(assets_file, rsaf_laptops, a380_laptops, cannot_assign_laptops),
+        include_course_types,
+        cannot_assign_laptops,
+        start_date,
+        days
+    )
+
+
 def count_fleet_per_month(file_path, include_course_types):
-    # Load the Excel file (assuming it contains a sheet with course data)
-    df = pd.read_excel(file_path)
-    
-    # Ensure that 'Course Type' and 'From' columns exist in the dataframe
-    if 'Course Type' not in df.columns or 'From' not in df.columns:
+    counts = monthly_device_counts(file_path, include_course_types)
+    if counts is None:
         return "Required columns ('Course Type', 'From') are missing from the data."
-    
-    # Filter courses where 'Course Type' is in the include_course_types list
-    filtered_courses = df[df['Course Type'].isin(include_course_types)].copy()
-    
-    # Convert 'From' to datetime format if it's not already
-    filtered_courses['From'] = pd.to_datetime(filtered_courses['From'], errors='coerce')
-    
-    # Extract the Year-Month period from the 'From' column
-    filtered_courses['YearMonth'] = filtered_courses['From'].dt.to_period('M')
-    
-    # Initialize counters for A320, A330, A350, and A380 per month
-    monthly_counts = {}
-
-    # Loop through filtered data and count based on the rules
-    for _, row in filtered_courses.iterrows():
-        # Extract the relevant data
-        course_type = row['Course Type']
-        customer = row['Customer']
-        year_month = row['YearMonth']
-        
-        # Initialize the counts for the month if not already in the dictionary
-        if year_month not in monthly_counts:
-            monthly_counts[year_month] = {'A320': 0, 'A330': 0, 'A350': 0, 'A380': 0}
-        
-        # Count based on the Course Type first letter
-        if course_type.startswith('E'):
-            monthly_counts[year_month]['A320'] += 1
-        elif course_type.startswith('G'):
-            monthly_counts[year_month]['A330'] += 1
-        elif course_type.startswith('V'):
-            monthly_counts[year_month]['A350'] += 1
-        elif course_type.startswith('L'):
-            monthly_counts[year_month]['A380'] += 1
-    
-    # Sort the months and prepare results
-    results = []  # List to store the results
-        
-    sorted_months = sorted(monthly_counts.keys())
-        
-    for month in sorted_months:
-        a320_count = monthly_counts[month]['A320']
-        a330_count = monthly_counts[month]['A330']
-        a350_count = monthly_counts[month]['A350']
-        a380_count = monthly_counts[month]['A380']
-            
-        # Format the month as "Month Year" using .to_timestamp() and .strftime()
-        formatted_month = month.to_timestamp().strftime("%B %Y")
-            
-        # Add the formatted result to the list
-        results.append(f"{formatted_month}: A320: {a320_count}, A330: {a330_count}, A350: {a350_count}, A380: {a380_count}")
-        
-    # Return the list of results
-    return results
+
+    # Format: 'October 2024: A320: 3, A330: 0, A350: 2, A380: 1'
+    return [
+        f"{month}: A320: {a320}, A330: {a330}, A350: {a350}, A380: {a380}"
+        for month, a320, a330, a350, a380 in zip(counts['Month'], counts['A320'], counts['A330'], counts['A350'], counts['A380'])
+    ]
@@ -1,19 +1,46 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, Response, jsonify
 from middle import middle_bp  # Assuming middle.py is a Flask Blueprint
 from top import top_bp  # Assuming top.py is a Flask Blueprint
 from bottom import bottom_bp  # Assuming bottom.py is a Flask Blueprint
+from jobs import jobs_bp
+from ingest import MAX_UPLOAD_BYTES
+import metrics
+from configuration import get_config
+
+# Importing the app stays light: pandas, numpy and openpyxl are imported by the first
+# request that parses an upload or writes a report, and config.json is read on first use
 
 app = Flask(__name__)
 
+# Reject oversized request bodies before they are spooled; ingest enforces the exact file limit
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
+
 # Register the blueprints
 app.register_blueprint(middle_bp, url_prefix='/middle')
 app.register_blueprint(top_bp, url_prefix='/top')
 app.register_blueprint(bottom_bp, url_prefix='/bottom')
+app.register_blueprint(jobs_bp, url_prefix='/jobs')
+
+# Time every request; ?profile=1 on any route returns a cProfile dump instead of the response
+app.before_request(metrics.start_request)
+app.after_request(metrics.finish_request)
+app.teardown_request(metrics.abandon_profile)
+
+@app.before_request
+def require_config():
+    # Every page reads the settings; say so once instead of failing inside the routes
+    if get_config() is None:
+        return jsonify({"error": "config.json is missing or invalid."}), 500
 
 @app.route('/')
 def dashboard():
     """Render the main dashboard with all sections."""
     return render_template('dashboard.html')
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose request latencies and stage durations in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
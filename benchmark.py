@@ -0,0 +1,599 @@
+"""
+Benchmarks for the TMM Dashboard on synthetic MyTeam / assets data.
+
+Generates SIN_ExportSeatsWithTraineesInfos workbooks and assets exports at each scale,
+times every public function in algorithms.py and every route of the app through the
+Flask test client, and writes a JSON report that can be diffed between releases.
+
+The app is run inside a scratch work directory (its own config.json copy, uploads
+folder and SQLite store), so the real uploads are never touched.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --scale 1000:200 20000:2000 200000:20000 --output bench.json
+    python benchmark.py --compare old.json --output new.json
+"""
+import argparse
+import contextlib
+import inspect
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+import algorithms
+import datasets
+import store
+
+
+# Course types that are not on the include list, so filtering has work to do
+other_course_types = ['EF40A1', 'VF40A1', 'VF40A1SG1', 'XF43A1', 'GF40A1', 'EF50A1', 'VF350A2']
+
+customers = ['SIA', '99Y', 'ATS', 'TGW', 'JSA', 'VNA', 'CEB', '/LO', '/C100']
+
+seat_statuses = ['Confirmed', 'Forecasted', 'PO|PA', 'Invoiced', 'Open', 'Offered', 'Planned']
+
+# Same list as the deployment list in middle.py
+columns_to_keep = ['Course', 'From', 'To', 'Course Type', 'Course Type Name', 'Seat Number', 'Customer', 'Customer Name', 'Trainee Firstname', 'Trainee Lastname', 'Staff ID']
+
+# Default (seats, assets) scales, from a small site to ten years of a large one
+DEFAULT_SCALES = ['1000:200', '20000:2000', '200000:20000']
+
+# Run in a fresh interpreter by bench_startup; prints the cold start timings as JSON
+STARTUP_SCRIPT = """
+import json, sys, time
+loaded_at_start = set(sys.modules)
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+loaded_by_import = [name for name in ('pandas', 'numpy', 'openpyxl', 'plotly') if name in sys.modules and name not in loaded_at_start]
+client = app.test_client()
+client.get('/')
+first_request = time.perf_counter()
+client.get('/top/')
+first_data_request = time.perf_counter()
+print(json.dumps({
+    'import_app_s': imported - start,
+    'first_request_s': first_request - imported,
+    'first_data_request_s': first_data_request - first_request,
+    'loaded_by_import': loaded_by_import
+}))
+"""
+
+
+def make_myteam_df(n_seats, include_course_types, anchor=None, seed=0):
+    """
+    Generates a synthetic SIN_ExportSeatsWithTraineesInfos table with n_seats seat rows.
+
+    Courses follow the export conventions: 'SIN<yy>-<7 digits>' course codes with one to
+    four seats each, a mix of included and other course types, 'WET' and 'DRY' courses,
+    and 'Trainee Code' values that repeat across the courses a trainee attends. Course
+    dates spread over the year before and after anchor (default: today).
+    """
+    rng = np.random.default_rng(seed)
+    anchor = pd.Timestamp(anchor or date.today())
+
+    n_courses = max(1, n_seats // 2)
+    seats_per_course = rng.integers(1, 5, n_courses)
+    course_of_seat = np.repeat(np.arange(n_courses), seats_per_course)[:n_seats]
+    seat_number = (pd.Series(course_of_seat).groupby(course_of_seat).cumcount() + 1).to_numpy()
+
+    type_pool = np.array(list(include_course_types) + other_course_types)
+    course_types = type_pool[rng.integers(0, len(type_pool), n_courses)]
+    course_from = anchor - pd.Timedelta(days=365) + pd.to_timedelta(rng.integers(0, 730, n_courses), unit='D')
+    course_to = course_from + pd.to_timedelta(rng.integers(0, 60, n_courses), unit='D')
+    course_customers = np.array(customers)[rng.integers(0, len(customers), n_courses)]
+    course_nature = np.where(rng.random(n_courses) < 0.3, 'DRY', 'WET')
+    course_codes = np.array([f'SIN{24 + c // 500000}-{2500000 + c % 500000:07d}' for c in range(n_courses)])
+
+    # Trainees are named once a course comes close, which leaves about 40% of the seats
+    # named, as in the real exports
+    n_trainees = max(1, n_seats // 3)
+    trainee = rng.integers(0, n_trainees, n_seats)
+    course_named = (course_from <= anchor + pd.Timedelta(days=30)) & (rng.random(n_courses) < 0.8)
+    named = np.asarray(course_named)[course_of_seat]
+
+    return pd.DataFrame({
+        'Course': course_codes[course_of_seat],
+        'From': course_from[course_of_seat],
+        'To': course_to[course_of_seat],
+        'Course Nature Code': course_nature[course_of_seat],
+        'Course Type': course_types[course_of_seat],
+        'Course Type Name': [f'Course type {t}' for t in course_types[course_of_seat]],
+        'Seat Number': seat_number,
+        'Status': np.array(seat_statuses)[rng.integers(0, len(seat_statuses), n_seats)],
+        'Customer': course_customers[course_of_seat],
+        'Customer Name': [f'Customer {c}' for c in course_customers[course_of_seat]],
+        'Trainee Code': [f'T{t:06d}' if n else None for t, n in zip(trainee, named)],
+        'Trainee Firstname': [f'First{t}' if n else None for t, n in zip(trainee, named)],
+        'Trainee Lastname': [f'Last{t}' if n else None for t, n in zip(trainee, named)],
+        'Staff ID': None,
+        'Seat From': course_from[course_of_seat] + pd.Timedelta(hours=9),
+        'Seat To': course_to[course_of_seat] + pd.Timedelta(hours=17),
+    })
+
+
+def make_assets_df(n_assets, courses_df=None, anchor=None, seed=0):
+    """
+    Generates a synthetic assets export with n_assets rows, split between L* laptops and AIP* iPads.
+
+    Most devices are in the M01-13 store room; with courses_df given, the rest are checked
+    out to courses with named trainees that end within two months of anchor (default:
+    today), so course locations, device searches and the overdue list all find something.
+    """
+    rng = np.random.default_rng(seed)
+    anchor = pd.Timestamp(anchor or date.today())
+
+    n_laptops = n_assets * 2 // 3
+    asset_ids = [f'L{i:03d}' for i in range(1, n_laptops + 1)] + [f'AIP{i:03d}' for i in range(1, n_assets - n_laptops + 1)]
+    is_laptop = np.arange(n_assets) < n_laptops
+
+    locations = np.full(n_assets, 'M01-13', dtype=object)
+    if courses_df is not None:
+        recent = courses_df[
+            courses_df['Trainee Code'].notna() &
+            (courses_df['To'] >= anchor - pd.Timedelta(days=60)) & (courses_df['To'] <= anchor + pd.Timedelta(days=60))
+        ]
+        course_codes = recent['Course'].unique()
+        if len(course_codes):
+            deployed = rng.random(n_assets) < 0.3
+            locations[deployed] = course_codes[rng.integers(0, len(course_codes), deployed.sum())]
+
+    fsa = np.array(['2413', '2412', '2312', '2409', 'NIL'])[rng.integers(0, 5, n_assets)]
+    fsa = np.where(is_laptop, fsa, None)
+    checked_out = locations != 'M01-13'
+
+    return pd.DataFrame({
+        'Asset ID': asset_ids,
+        'Asset Name': np.where(is_laptop, 'Lenovo Yoga 370', 'iPad Air'),
+        'Asset Type': np.where(is_laptop, 'TB-Laptop', 'TB-iPad-Air'),
+        'Serial Number': [f'SN{i:08d}' for i in rng.integers(0, 10 ** 8, n_assets)],
+        'Company': 'AATC',
+        'Location': locations,
+        'Status': 'Ready',
+        'FSA': fsa,
+        'Warranty End': '7/3/2026',
+        'Date Added': '2024-04-29 13:47:12',
+        'Last Activity': np.where(checked_out, 'Checked-out', 'Available'),
+        'Group': np.where(is_laptop, 'TB/Laptops', 'TB/AIP'),
+    })
+
+
+def write_synthetic_uploads(directory, n_seats, n_assets, include_course_types, seed=0):
+    """
+    Writes a synthetic MyTeam workbook and assets CSV for one scale into directory.
+
+    Files that already exist are reused, since writing a large workbook takes a while.
+
+    Returns:
+        tuple: (MyTeam workbook path, assets CSV path, seconds spent generating)
+    """
+    os.makedirs(directory, exist_ok=True)
+    myteam_file = os.path.join(directory, f'SIN_ExportSeatsWithTraineesInfos_{n_seats}_{seed}.xlsx')
+    assets_file = os.path.join(directory, f'assets-{n_seats}-{n_assets}-{seed}.csv')
+
+    start = time.perf_counter()
+    courses_df = make_myteam_df(n_seats, include_course_types, seed=seed)
+    if not os.path.exists(myteam_file):
+        courses_df.to_excel(myteam_file, index=False)
+    if not os.path.exists(assets_file):
+        make_assets_df(n_assets, courses_df, seed=seed).to_csv(assets_file, index=False)
+    return myteam_file, assets_file, time.perf_counter() - start
+
+
+def time_call(func, *args, repeat=3, setup=None):
+    """
+    Returns the best wall-clock time of func(*args) over repeat runs, in seconds.
+
+    setup, if given, is run untimed before each run.
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def public_functions(module):
+    """
+    Returns the names of the public functions defined in module.
+    """
+    return sorted(
+        name for name, func in inspect.getmembers(module, inspect.isfunction)
+        if not name.startswith('_') and func.__module__ == module.__name__
+    )
+
+
+def function_calls(myteam_file, assets_file, config):
+    """
+    Returns algorithms function name -> zero-argument callable running it on the given uploads.
+    """
+    myteam_df = datasets.load_myteam(myteam_file)
+    assets_df = datasets.load_assets(assets_file)
+    courses_df = myteam_df.sort_values(by=['From', 'Course'])
+    sorted_assets = assets_df.sort_values(by=['FSA', 'Asset ID'], ascending=[False, True])
+    laptops_df = sorted_assets[
+        (sorted_assets['Location'] == 'M01-13') &
+        (sorted_assets['Asset ID'].str.startswith('L')) &
+        (sorted_assets['FSA'].notna()) & (sorted_assets['FSA'] != 'NIL')
+    ]
+    ipads = sorted_assets[(sorted_assets['Location'] == 'M01-13') & (sorted_assets['Asset ID'].str.startswith('AIP'))]['Asset ID'].tolist()
+
+    today = date.today()
+    this_thursday = today + timedelta(days=(3 - today.weekday() + 7) % 7)
+    device_ids = assets_df['Asset ID'].head(100).tolist()
+    include = config['include_course_types']
+    od_days = int(config['OD_Days'][0])
+
+    def updated_assets():
+        # A new export with 1% of the devices moved back to the store room
+        new_df = assets_df.copy()
+        moved = new_df.index[::100]
+        new_df.loc[moved, 'Location'] = 'M01-13'
+        return new_df
+
+    new_assets_df = updated_assets()
+    delta = datasets.diff_assets(assets_df, new_assets_df)
+    course_table = algorithms.build_course_locations(myteam_df, assets_df)
+    index = algorithms.build_device_index(myteam_df, assets_df)
+    calendar = algorithms.build_availability_calendar(myteam_df, assets_df)
+    inventory = algorithms.build_inventory_counts(assets_df, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'])
+
+    pools = algorithms.laptop_pools(laptops_df, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'])
+    pool_devices = {pool: [asset_id for asset_id, _ in laptops] for pool, laptops in pools.items()}
+    starts = algorithms.day_numbers(courses_df['From'])
+    ends = algorithms.day_numbers(courses_df['To'])
+    seat_pools = algorithms.seat_laptop_pools(courses_df)
+    first_rows = assets_df.drop_duplicates(subset='Asset ID')
+    states = dict(zip(first_rows['Asset ID'], zip(first_rows['Location'], first_rows['Status'])))
+    now = datetime.now()
+
+    return {
+        'allocate_ipads': lambda: algorithms.allocate_ipads(courses_df, ipads),
+        'allocate_ipads_window': lambda: algorithms.allocate_ipads_window(courses_df, ipads),
+        'allocate_laptops': lambda: algorithms.allocate_laptops(courses_df, laptops_df, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']),
+        'allocate_laptops_window': lambda: algorithms.allocate_laptops_window(courses_df, laptops_df, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']),
+        'assign_over_window': lambda: algorithms.assign_over_window(starts, ends, seat_pools, pool_devices),
+        'availability_calendar': lambda: algorithms.availability_calendar(myteam_file, assets_file),
+        'build_availability_calendar': lambda: algorithms.build_availability_calendar(myteam_df, assets_df),
+        'build_course_end_dates': lambda: algorithms.build_course_end_dates(course_table),
+        'build_course_locations': lambda: algorithms.build_course_locations(myteam_df, assets_df),
+        'build_device_index': lambda: algorithms.build_device_index(myteam_df, assets_df),
+        'build_inventory_counts': lambda: algorithms.build_inventory_counts(assets_df, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']),
+        'build_monthly_device_counts': lambda: algorithms.build_monthly_device_counts(myteam_df, include),
+        'build_shortfall_forecast': lambda: algorithms.build_shortfall_forecast(
+            myteam_df, assets_df, calendar, inventory, include, config['cannot_assign_laptops'], today, 365
+        ),
+        'count_courses_per_month': lambda: algorithms.count_courses_per_month(myteam_file, include),
+        'count_fleet_per_month': lambda: algorithms.count_fleet_per_month(myteam_file, include),
+        'course_endings': lambda: algorithms.course_endings(assets_file, myteam_file, this_thursday),
+        'course_locations': lambda: algorithms.course_locations(assets_file, myteam_file),
+        'day_numbers': lambda: algorithms.day_numbers(courses_df['From']),
+        'device_index': lambda: algorithms.device_index(myteam_file, assets_file),
+        'device_pool': lambda: algorithms.device_pool(
+            'laptops', 'General', config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'], config['cannot_assign_ipads']
+        ),
+        'device_return': lambda: [algorithms.device_return(calendar, device_id) for device_id in device_ids],
+        'free_devices': lambda: [algorithms.free_devices(calendar, day, day + timedelta(days=7)) for day in (today + timedelta(days=days) for days in range(0, 364, 7))],
+        'inventory_counts': lambda: algorithms.inventory_counts(assets_file, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']),
+        'laptop_pools': lambda: algorithms.laptop_pools(laptops_df, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']),
+        'location_device_pairs': lambda: algorithms.location_device_pairs(assets_df.rename(columns=lambda column: column.strip().lower())),
+        'lookup_device': lambda: [algorithms.lookup_device(index, device_id) for device_id in device_ids],
+        'lookup_device_as_of': lambda: [algorithms.lookup_device_as_of(index, states, device_id, now) for device_id in device_ids],
+        'missing_columns': lambda: algorithms.missing_columns(myteam_df, algorithms.REQUIRED_MYTEAM_COLUMNS),
+        'monthly_device_counts': lambda: algorithms.monthly_device_counts(myteam_file, include),
+        'process_course_data_with_date_filter': lambda: algorithms.process_course_data_with_date_filter(assets_file, myteam_file, this_thursday),
+        'process_device_info': lambda: algorithms.process_device_info(myteam_file, assets_file, device_ids[0]),
+        'process_devices_info': lambda: algorithms.process_devices_info(myteam_file, assets_file, device_ids),
+        'process_excel': lambda: algorithms.process_excel(
+            myteam_file, 'tmm_benchmark_deployment', today, today + timedelta(days=28), include, assets_file, columns_to_keep,
+            config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'], config['cannot_assign_ipads'],
+            config['customers_to_exclude']
+        ),
+        'process_overdue_devices_with_save': lambda: algorithms.process_overdue_devices_with_save(myteam_file, assets_file, od_days, output_file='tmm_benchmark_overdue'),
+        'return_day_arrays': lambda: algorithms.return_day_arrays(calendar),
+        'seat_device_needs': lambda: algorithms.seat_device_needs(myteam_df),
+        'seat_laptop_pools': lambda: algorithms.seat_laptop_pools(courses_df),
+        'set_course_location': lambda: algorithms.set_course_location(course_table.copy(), 'M01-13', device_ids),
+        'set_device_returns': lambda: algorithms.set_device_returns({'course_return': calendar['course_return'], 'device_return': {}, 'device_kind': {}}, assets_df),
+        'shortfall_forecast': lambda: algorithms.shortfall_forecast(myteam_file, assets_file, include, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'], today, 365),
+        'to_datetime_column': lambda: algorithms.to_datetime_column(myteam_df['To'].dt.strftime('%d-%b-%y')),
+        'update_availability_calendar': lambda: algorithms.update_availability_calendar(
+            dict(calendar), delta, new_assets_df
+        ),
+        'update_course_locations': lambda: algorithms.update_course_locations(course_table.copy(), delta, new_assets_df),
+        'update_device_index': lambda: algorithms.update_device_index(dict(index), delta, new_assets_df),
+    }
+
+
+def reload_uploads(myteam_file, assets_file):
+    # Drop every parsed frame and derived structure, then parse the uploads again
+    datasets.invalidate()
+    datasets.load_myteam(myteam_file)
+    datasets.load_assets(assets_file)
+
+
+def bench_functions(myteam_file, assets_file, config, repeat):
+    """
+    Times every public function in algorithms.py on the given uploads.
+
+    cold_s is measured with the derived caches dropped (the uploads themselves stay
+    parsed), warm_s with everything the previous call cached still in place.
+
+    Returns:
+        tuple: (function name -> timings, names of public functions with no benchmark call)
+    """
+    calls = function_calls(myteam_file, assets_file, config)
+    results = {}
+    for name, call in calls.items():
+        cold = time_call(call, repeat=repeat, setup=lambda: reload_uploads(myteam_file, assets_file))
+        warm = time_call(call, repeat=repeat)
+        results[name] = {'cold_s': round(cold, 4), 'warm_s': round(warm, 4)}
+
+    untimed = [name for name in public_functions(algorithms) if name not in calls]
+    return results, untimed
+
+
+def wait_for_job(client, job_id, timeout=600):
+    """
+    Polls /jobs/<job_id> until the job is done and returns its final state.
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in ('finished', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise RuntimeError(f'Job {job_id} did not finish within {timeout}s')
+
+
+def route_requests(myteam_file, assets_file, config):
+    """
+    Returns route name -> function sending one request through a test client.
+
+    Uploads come first, since every other route reads the uploaded files. /generate
+    routes are timed until their background job finishes.
+    """
+    assets_df = datasets.load_assets(assets_file)
+    myteam_df = datasets.load_myteam(myteam_file)
+    device_ids = assets_df['Asset ID'].head(50).tolist()
+    course = myteam_df['Course'].iloc[len(myteam_df) // 2]
+    today = date.today()
+    dates = {'start_date': today.isoformat(), 'end_date': (today + timedelta(days=28)).isoformat()}
+
+    def upload(prefix, kind, file_path):
+        def send(client):
+            with open(file_path, 'rb') as file:
+                response = client.post(f'/{prefix}/upload-{kind}', data={'file': (file, os.path.basename(file_path))}, content_type='multipart/form-data')
+            # Let the cache warm-up finish so it does not overlap the next measurement
+            warm_job_id = (response.get_json() or {}).get('warm_job_id')
+            if warm_job_id:
+                wait_for_job(client, warm_job_id)
+            return response
+        return send
+
+    last_job = {}
+
+    def generate(prefix):
+        def send(client):
+            response = client.post(f'/{prefix}/generate', json=dates)
+            job = wait_for_job(client, response.get_json()['job_id'])
+            if job['status'] != 'finished':
+                raise RuntimeError(f"/{prefix}/generate failed: {job['error']}")
+            last_job['id'] = job['id']
+            last_job[prefix] = (job['result']['output_file'], {'download_name': job['result']['download_name']})
+            return response
+        return send
+
+    requests = {
+        'POST /middle/upload-myteam': upload('middle', 'myteam', myteam_file),
+        'POST /middle/upload-assets': upload('middle', 'assets', assets_file),
+        'POST /bottom/upload-myteam': upload('bottom', 'myteam', myteam_file),
+        'POST /bottom/upload-assets': upload('bottom', 'assets', assets_file),
+        'GET /': lambda client: client.get('/'),
+        'GET /top/': lambda client: client.get('/top/'),
+        'GET /top/update_date': lambda client: client.get(f'/top/update_date?end_date={today.isoformat()}'),
+        'POST /top/get_search_results': lambda client: client.post('/top/get_search_results', json={'deviceId': device_ids[0]}),
+        'POST /top/get_search_results_batch': lambda client: client.post('/top/get_search_results_batch', json={'deviceIds': device_ids}),
+        'POST /top/search-device': lambda client: client.post('/top/search-device', json={'deviceId': device_ids[0]}),
+        'GET /top/api/charts': lambda client: client.get('/top/api/charts'),
+        'GET /top/api/forecast': lambda client: client.get('/top/api/forecast?weeks=52'),
+        'GET /top/inventory-counts': lambda client: client.get('/top/inventory-counts'),
+        'GET /top/cache-stats': lambda client: client.get('/top/cache-stats'),
+        'GET /top/availability': lambda client: client.get(f"/top/availability?start_date={dates['start_date']}&end_date={dates['end_date']}"),
+        'GET /top/device-return/<device_id>': lambda client: client.get(f'/top/device-return/{device_ids[0]}'),
+        'GET /top/device-history/<device_id>': lambda client: client.get(f'/top/device-history/{device_ids[0]}?as_of={today.isoformat()}'),
+        'GET /middle/': lambda client: client.get('/middle/'),
+        'GET /middle/settings': lambda client: client.get('/middle/settings'),
+        'POST /middle/settings': lambda client: client.post('/middle/settings', json=config),
+        'POST /middle/generate': generate('middle'),
+        'GET /middle/allocations': lambda client: client.get(f'/middle/allocations?course={course}'),
+        'GET /middle/download/<filename>': lambda client: client.get(f"/middle{last_job['middle'][0]}", query_string=last_job['middle'][1]),
+        'GET /bottom/': lambda client: client.get('/bottom/'),
+        'GET /bottom/settings': lambda client: client.get('/bottom/settings'),
+        'POST /bottom/settings': lambda client: client.post('/bottom/settings', json=config),
+        'POST /bottom/generate': generate('bottom'),
+        'GET /bottom/download/<filename>': lambda client: client.get(f"/bottom{last_job['bottom'][0]}", query_string=last_job['bottom'][1]),
+        'GET /metrics': lambda client: client.get('/metrics'),
+        'GET /jobs/<job_id>': lambda client: client.get(f"/jobs/{last_job['id']}"),
+    }
+    for chart_type in ('laptops_donut', 'ipads_donut', 'monthly_bar', 'monthly_fleet'):
+        requests[f'GET /top/api/charts/{chart_type}'] = lambda client, chart_type=chart_type: client.get(f'/top/api/charts/{chart_type}')
+    return requests
+
+
+def bench_routes(app, myteam_file, assets_file, config, repeat):
+    """
+    Times every route of the app through the Flask test client on the given uploads.
+
+    Uploads are sent once per route; the other routes get cold_s (in-process caches
+    dropped before each request) and warm_s timings.
+
+    Returns:
+        tuple: (route name -> timings and status, routes of the app with no benchmark request)
+    """
+    # Every MyTeam export in uploads/ is merged, so drop the exports of earlier scales and runs
+    for filename in os.listdir(store.UPLOAD_FOLDER):
+        if filename.startswith(('SIN', 'assets')):
+            os.remove(os.path.join(store.UPLOAD_FOLDER, filename))
+
+    client = app.test_client()
+    requests = route_requests(myteam_file, assets_file, config)
+    results = {}
+    for name, send in requests.items():
+        status = None
+
+        def timed():
+            nonlocal status
+            status = send(client).status_code
+
+        if '/upload-' in name:
+            results[name] = {'s': round(time_call(timed, repeat=1), 4)}
+        else:
+            cold = time_call(timed, repeat=repeat, setup=datasets.invalidate)
+            warm = time_call(timed, repeat=repeat)
+            results[name] = {'cold_s': round(cold, 4), 'warm_s': round(warm, 4)}
+        results[name]['status'] = status
+
+    covered = {name.split(' ', 1)[1].split('/api/charts/')[0] for name in requests}
+    untimed = sorted(
+        str(rule) for rule in app.url_map.iter_rules()
+        if rule.endpoint != 'static' and str(rule).split('/api/charts/')[0] not in covered
+    )
+    return results, untimed
+
+
+def bench_startup(repo_dir, config, repeat, seed=0):
+    """
+    Times cold starts of the app in fresh interpreters, run in a 'startup' subdirectory
+    with a small synthetic upload.
+
+    process_s runs from launching the interpreter to the answer of the first request that
+    reads the uploads (GET /top/). import_app_s is the time to import app.py,
+    first_request_s the time to serve GET / after that, and first_data_request_s the time
+    to serve GET /top/ after that. loaded_by_import lists the heavy libraries that
+    importing app.py pulled in.
+
+    Returns:
+        dict: The best of repeat runs for every timing.
+    """
+    os.makedirs(os.path.join('startup', 'uploads'), exist_ok=True)
+    shutil.copy('config.json', os.path.join('startup', 'config.json'))
+    write_synthetic_uploads(os.path.join('startup', 'uploads'), 1000, 200, config['include_course_types'], seed=seed)
+
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo_dir, os.environ.get('PYTHONPATH')])))
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd='startup', env=environment,
+                                   capture_output=True, text=True, check=True)
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        run['process_s'] = time.perf_counter() - start
+        runs.append(run)
+
+    result = {name: round(min(run[name] for run in runs), 4) for name in ('process_s', 'import_app_s', 'first_request_s', 'first_data_request_s')}
+    result['loaded_by_import'] = runs[-1]['loaded_by_import']
+    return result
+
+
+def compare_reports(old_report, new_report, threshold):
+    """
+    Returns the timings of new_report that are more than threshold times slower than in old_report.
+    """
+    def timings(report):
+        flat = {('startup', 'startup', name, 's'): value for name, value in report.get('startup', {}).items() if name.endswith('_s')}
+        for scale in report['scales']:
+            label = f"{scale['seats']}:{scale['assets']}"
+            for section in ('functions', 'routes'):
+                for name, result in scale.get(section, {}).items():
+                    for metric, value in result.items():
+                        if metric != 'status':
+                            flat[(label, section, name, metric)] = value
+        return flat
+
+    old, new = timings(old_report), timings(new_report)
+    regressions = []
+    for key, value in new.items():
+        # Sub-millisecond timings are mostly noise
+        if key in old and value > 0.001 and value > old[key] * threshold:
+            label, section, name, metric = key
+            regressions.append({'scale': label, 'section': section, 'name': name, 'metric': metric,
+                                'old': old[key], 'new': value, 'ratio': round(value / max(old[key], 1e-9), 2)})
+    return regressions
+
+
+def prepare_workdir(workdir):
+    # The app reads config.json and uploads/ from the working directory
+    os.makedirs(os.path.join(workdir, 'uploads'), exist_ok=True)
+    shutil.copy('config.json', os.path.join(workdir, 'config.json'))
+    return os.path.abspath(workdir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard functions and routes on synthetic data.')
+    parser.add_argument('--scale', nargs='+', default=DEFAULT_SCALES, help='SEATS:ASSETS pairs to benchmark.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per timing; the best run is reported.')
+    parser.add_argument('--only', choices=['functions', 'routes', 'startup'], help='Only time the algorithms functions, the routes or the cold start.')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'tmm-benchmark'),
+                        help='Scratch directory for the generated files, uploads and store.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report here instead of printing it.')
+    parser.add_argument('--compare', help='Previous JSON report to check for regressions.')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Slowdown ratio reported as a regression.')
+    args = parser.parse_args()
+
+    with open('config.json', 'r') as file:
+        config = json.load(file)
+    output = os.path.abspath(args.output) if args.output else None
+    compare = os.path.abspath(args.compare) if args.compare else None
+
+    # Import the app only once inside the work directory, so its store lives there
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(prepare_workdir(args.workdir))
+    from app import app
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'scales': []
+    }
+    # The report may go to stdout, so the app's own prints are sent to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.only in (None, 'startup'):
+            report['startup'] = bench_startup(repo_dir, config, args.repeat, seed=args.seed)
+
+        for scale in args.scale if args.only != 'startup' else []:
+            n_seats, n_assets = (int(value) for value in scale.split(':'))
+            myteam_file, assets_file, generate_s = write_synthetic_uploads('data', n_seats, n_assets, config['include_course_types'], seed=args.seed)
+            result = {'seats': n_seats, 'assets': n_assets, 'generate_s': round(generate_s, 4)}
+
+            if args.only != 'routes':
+                result['functions'], report['untimed_functions'] = bench_functions(myteam_file, assets_file, config, args.repeat)
+            if args.only != 'functions':
+                result['routes'], report['untimed_routes'] = bench_routes(app, myteam_file, assets_file, config, args.repeat)
+            report['scales'].append(result)
+
+    if compare:
+        with open(compare, 'r') as file:
+            report['regressions'] = compare_reports(json.load(file), report, args.threshold)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded least-recently-used cache with hit/miss counters.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key, builder):
+        """
+        Returns the cached value for key, calling builder() to compute it on a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = builder()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+
+def config_hash(*values):
+    """
+    Returns a short, stable hash of JSON-serializable settings, for use in cache keys.
+    """
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+# /top chart data, cleared on upload and on settings changes
+chart_cache = LRUCache(maxsize=32)
+
+# 'Courses Ending' table rows per end date, cleared on upload
+course_table_cache = LRUCache(maxsize=64)
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+
+
+# config.json is the single source of truth for the settings. Every worker process reads
+# it through get_config(), which re-reads the file whenever it changes on disk, so a
+# setting saved through any worker is seen by all of them.
+CONFIG_FILE = 'config.json'
+
+# Settings the pages read; each is a list of strings, and OD_Days holds a whole number of days
+REQUIRED_SETTINGS = ('rsaf_laptops', 'a380_laptops', 'cannot_assign_laptops', 'cannot_assign_ipads',
+                     'include_course_types', 'customers_to_exclude', 'OD_Days')
+
+_cached = None  # (mtime_ns, size) signature -> parsed config
+_lock = threading.Lock()
+
+
+def _signature():
+    stat = os.stat(CONFIG_FILE)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_config():
+    """
+    Returns the current settings from config.json, or None if the file cannot be read.
+
+    The parsed file is cached until config.json changes, so calling this on every request
+    costs a single stat.
+    """
+    global _cached
+    try:
+        signature = _signature()
+        with _lock:
+            if _cached is not None and _cached[0] == signature:
+                return _cached[1]
+
+        with open(CONFIG_FILE, 'r') as file:
+            config = json.load(file)
+
+        with _lock:
+            _cached = (signature, config)
+        return config
+    except Exception as e:
+        return None
+
+
+def validate_config(config):
+    """
+    Checks settings posted by a settings page before they are saved.
+
+    Returns:
+        str: What is wrong with the settings, or None if they can be saved.
+    """
+    if not isinstance(config, dict):
+        return "Settings must be a JSON object."
+
+    for key in REQUIRED_SETTINGS:
+        value = config.get(key)
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return f"Setting {key} must be a list of strings."
+
+    try:
+        int(config['OD_Days'][0])
+    except (IndexError, ValueError):
+        return "Setting OD_Days must hold a whole number of days."
+    return None
+
+
+def save_config(updated_config):
+    """
+    Writes the settings to config.json.
+
+    The file is written to a temporary file first and then swapped in, so readers in other
+    workers never see a half-written config.
+
+    Returns:
+        bool: Whether the settings were saved.
+    """
+    temp_file = f'{CONFIG_FILE}.{os.getpid()}.tmp'
+    try:
+        with open(temp_file, 'w') as file:
+            json.dump(updated_config, file, indent=4)
+        os.replace(temp_file, CONFIG_FILE)
+        return True
+    except Exception as e:
+        return False
@@ -0,0 +1,432 @@
+import json
+import os
+import threading
+from metrics import span
+
+
+# Parsed uploads, shared by every blueprint and by algorithms.py.
+# Each entry is keyed by the absolute file path and remembers the (mtime, size)
+# signature it was parsed from, so a replaced upload is re-parsed automatically.
+_frames = {}
+_frames_lock = threading.Lock()
+_path_locks = {}
+
+# Structures derived from the parsed uploads, keyed by
+# name -> (dataset version, value, absolute file paths, assets delta updater or None)
+_derived = {}
+
+# Absolute path of the assets export loaded most recently; new uploads are diffed against it
+_latest_assets = None
+
+# Assets delta files are stored next to the upload they describe
+DELTA_SUFFIX = '.delta.json'
+
+# Callbacks run with the file path whenever an entry is invalidated
+_invalidation_listeners = []
+
+# A merged MyTeam dataset is a small JSON manifest listing the exports it combines,
+# newest first; it is loaded like a workbook (see load_myteam)
+MERGED_MYTEAM_SUFFIX = '.merged.json'
+
+
+def file_signature(file_path):
+    """
+    Returns the (path, mtime, size) signature used to key the dataset store.
+    """
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_version(*file_paths):
+    """
+    Returns a hashable version key for the given files.
+
+    The key changes whenever any of the files is replaced, so it can be used to
+    key caches of anything derived from the parsed data.
+    """
+    return tuple(file_signature(file_path) for file_path in file_paths)
+
+
+def _read_myteam(file_path):
+    if file_path.endswith(MERGED_MYTEAM_SUFFIX):
+        return _read_merged_myteam(file_path)
+
+    from snapshots import read_snapshot
+
+    # The columnar snapshot is much faster to load than the workbook itself
+    with span('read_snapshot'):
+        df = read_snapshot(file_path)
+    if df is not None:
+        return df
+
+    df = _parse_myteam(file_path)
+    _write_snapshot(df, file_path)
+    return df
+
+
+def _parse_myteam(file_path):
+    # pandas is imported on first parse, not when the app starts
+    import pandas as pd
+
+    with span('read_excel'):
+        sheets = list(pd.read_excel(file_path, sheet_name=None).values())
+    for sheet in sheets:
+        sheet.columns = [column.strip() if isinstance(column, str) else column for column in sheet.columns]
+
+    # Every sheet with seats in it is part of the export; without any, keep the first
+    # sheet so the upload is rejected for its missing columns
+    seat_sheets = [sheet for sheet in sheets if 'Course' in sheet.columns]
+    if not seat_sheets:
+        return sheets[0]
+    return seat_sheets[0] if len(seat_sheets) == 1 else pd.concat(seat_sheets, ignore_index=True, sort=False)
+
+
+def _write_snapshot(df, file_path):
+    from snapshots import write_snapshot
+
+    try:
+        with span('write_snapshot'):
+            write_snapshot(df, file_path)
+    except (OSError, ValueError) as e:
+        print(f"Could not write snapshot for {file_path}: {e}")
+
+
+def merge_myteam(frames):
+    """
+    Merges MyTeam exports into one seat table, taking every course from the first frame
+    that has it, so frames should be passed newest first.
+
+    A newer export replaces all seats of a course at once: seats that were vacant in an
+    older export often have a trainee in a newer one, and seats it no longer lists are gone.
+    A course that only older exports list is dropped when it starts within the dates a newer
+    export covers (from its first to its last course start), as it has been cancelled.
+
+    Rows are never dropped within a frame, since exports repeat rows. Rows are ordered by
+    frame, then by their position in it. A single frame is returned as it is.
+    """
+    if len(frames) == 1:
+        return frames[0]
+
+    import numpy as np
+    import pandas as pd
+
+    merged = pd.concat(frames, ignore_index=True, sort=False)
+    export = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+
+    # One hash aggregation over all rows finds the newest export of every course
+    newest = pd.Series(export).groupby(merged['Course'].to_numpy(), dropna=False, sort=False).transform('min').to_numpy()
+    keep = export == newest
+
+    starts = pd.to_datetime(merged['From'], errors='coerce').to_numpy() if 'From' in merged.columns else None
+    if starts is not None:
+        for position in range(len(frames) - 1):
+            window = starts[export == position]
+            window = window[~np.isnat(window)]
+            if len(window):
+                keep &= ~((export > position) & (starts >= window.min()) & (starts <= window.max()))
+    return merged[keep].reset_index(drop=True)
+
+
+def write_merged_myteam(manifest_path, file_paths):
+    """
+    Writes the manifest of a merged MyTeam dataset combining file_paths, newest first.
+
+    The manifest is written to a temporary file first and then swapped in, so its new
+    signature tells every worker to load the merged dataset again.
+    """
+    temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump({'exports': [os.path.basename(file_path) for file_path in file_paths]}, file, indent=4)
+    os.replace(temp_path, manifest_path)
+
+
+def merged_exports(manifest_path):
+    """
+    Returns the paths of the exports a merged MyTeam dataset lists that still exist, newest first.
+    """
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+
+    directory = os.path.dirname(manifest_path)
+    file_paths = [os.path.join(directory, filename) for filename in manifest['exports']]
+    return [file_path for file_path in file_paths if os.path.isfile(file_path)]
+
+
+def _read_merged_myteam(manifest_path):
+    # Each export is parsed (or read from its snapshot) once and shared with direct loads of it
+    frames = [load_myteam(file_path) for file_path in merged_exports(manifest_path)]
+    if not frames:
+        raise FileNotFoundError(f"None of the exports listed in {manifest_path} exist.")
+
+    with span('merge_myteam'):
+        return merge_myteam(frames)
+
+
+def _read_assets(file_path):
+    import pandas as pd
+
+    with span('read_csv'):
+        df = pd.read_csv(file_path)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def _load(file_path, reader):
+    signature = file_signature(file_path)
+    key = signature[0]
+
+    with _frames_lock:
+        entry = _frames.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        path_lock = _path_locks.setdefault(key, threading.Lock())
+
+    # Parse outside the global lock so different files can load in parallel,
+    # but only once per file when several requests ask for it at the same time
+    with path_lock:
+        with _frames_lock:
+            entry = _frames.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+        frame = reader(file_path)
+
+        with _frames_lock:
+            _frames[key] = (signature, frame)
+    return frame
+
+
+def load_myteam(file_path):
+    """
+    Returns the parsed MyTeam workbook (SIN_ExportSeatsWithTraineesInfos_*.xlsx), with the
+    seats of all its sheets, or the merged seats of a merged MyTeam manifest.
+
+    The same DataFrame is handed to every caller until the file changes on disk,
+    so callers must treat it as read-only and copy it before mutating.
+    """
+    return _load(file_path, _read_myteam)
+
+
+def load_assets(file_path):
+    """
+    Returns the parsed assets export (assets-*.csv).
+
+    The same DataFrame is handed to every caller until the file changes on disk,
+    so callers must treat it as read-only and copy it before mutating.
+    """
+    global _latest_assets
+    frame = _load(file_path, _read_assets)
+    _latest_assets = os.path.abspath(file_path)
+    return frame
+
+
+def read_upload(kind, file_path):
+    """
+    Parses a MyTeam ('myteam') or assets ('assets') upload without adding it to the store,
+    so it can be validated before it replaces anything (see ingest_myteam and ingest_assets).
+    """
+    return _parse_myteam(file_path) if kind == 'myteam' else _read_assets(file_path)
+
+
+def ingest_myteam(file_path, df):
+    """
+    Loads a newly uploaded MyTeam export that was already parsed with read_upload, and
+    writes its columnar snapshot. Derived structures are dropped.
+    """
+    invalidate(file_path)
+    with _frames_lock:
+        _frames[os.path.abspath(file_path)] = (file_signature(file_path), df)
+    _write_snapshot(df, file_path)
+
+
+def load_derived(name, file_paths, builder, updater=None):
+    """
+    Returns builder(), computed once per dataset version of file_paths.
+
+    Use this for indexes and aggregates built from the parsed uploads so they are
+    rebuilt only when one of the underlying files is replaced.
+
+    Args:
+        name (str): Unique name of the derived structure.
+        file_paths (list): The upload files the structure is built from.
+        builder (callable): Builds the structure; called without arguments.
+        updater (callable): Optional updater(value, delta, assets_df) that returns the structure
+            brought up to date with a new assets upload (see ingest_assets). It must not change
+            value, which other requests may still be reading. Without one, the structure is
+            rebuilt from scratch after every assets upload.
+    """
+    version = dataset_version(*file_paths)
+
+    with _frames_lock:
+        entry = _derived.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+    # Names can carry the settings they were built with; only the base name is a stage
+    with span(f'build_{name[0] if isinstance(name, tuple) else name}'):
+        value = builder()
+
+    with _frames_lock:
+        _derived[name] = (version, value, [os.path.abspath(path) for path in file_paths], updater)
+    return value
+
+
+def diff_assets(old_df, new_df):
+    """
+    Compares two versions of the assets export row by row, matching rows on 'Asset ID'.
+
+    Rows that share an Asset ID (e.g. furniture without asset tags) are matched in order
+    of appearance.
+
+    Returns:
+        dict: 'added' and 'removed' Asset IDs, 'changed' as {Asset ID: {column: [old, new]}},
+        and 'locations', every location an added, removed or changed asset was or is now in.
+        None if the exports cannot be diffed because their columns differ.
+    """
+    if list(old_df.columns) != list(new_df.columns) or 'Asset ID' not in new_df.columns:
+        return None
+
+    def keyed(df):
+        occurrence = df.groupby('Asset ID', sort=False, dropna=False).cumcount()
+        return df.set_index([df['Asset ID'].rename('Asset ID'), occurrence.rename('occurrence')]).drop(columns='Asset ID')
+
+    old_rows = keyed(old_df)
+    new_rows = keyed(new_df)
+    added = new_rows.index.difference(old_rows.index, sort=False)
+    removed = old_rows.index.difference(new_rows.index, sort=False)
+    common = new_rows.index.intersection(old_rows.index, sort=False)
+
+    # Compare every common row in one pass; two missing values count as equal
+    old_values = old_rows.loc[common].astype(object)
+    new_values = new_rows.loc[common].astype(object)
+    differs = ~((old_values == new_values) | (old_values.isna() & new_values.isna()))
+    changed_rows = differs.index[differs.any(axis=1).to_numpy()]
+
+    changed = {}
+    for key in changed_rows:
+        columns = differs.columns[differs.loc[key].to_numpy()]
+        changed.setdefault(key[0], {}).update({
+            column: [_json_value(old_values.at[key, column]), _json_value(new_values.at[key, column])]
+            for column in columns
+        })
+
+    locations = set(old_rows.loc[removed.append(changed_rows), 'Location'].dropna())
+    locations |= set(new_rows.loc[added.append(changed_rows), 'Location'].dropna())
+
+    return {
+        'added': list(dict.fromkeys(added.get_level_values('Asset ID'))),
+        'removed': list(dict.fromkeys(removed.get_level_values('Asset ID'))),
+        'changed': changed,
+        'locations': sorted(locations)
+    }
+
+
+def _json_value(value):
+    import pandas as pd
+
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def delta_path(file_path):
+    """
+    Returns the path of the delta file stored next to an assets upload.
+    """
+    return os.path.splitext(file_path)[0] + DELTA_SUFFIX
+
+
+def ingest_assets(file_path, new_df=None):
+    """
+    Loads a newly uploaded assets export incrementally, from new_df if it was already
+    parsed with read_upload.
+
+    The new export is diffed against the previously loaded one by 'Asset ID'. The delta is
+    written next to the upload (see delta_path), and derived structures registered with an
+    updater are brought up to date instead of being rebuilt, each as a new value that replaces
+    the old one under the store lock, so readers never see a half-applied delta. Other structures that
+    depend on the previous assets export are dropped; structures built from MyTeam only
+    are kept. The previous export's DataFrame is dropped as well.
+
+    Returns:
+        dict: The delta (see diff_assets), or None if there was nothing to diff against
+        and the export was loaded from scratch.
+    """
+    global _latest_assets
+    key = os.path.abspath(file_path)
+
+    with _frames_lock:
+        previous_key = _latest_assets
+        previous = _frames.get(previous_key) if previous_key is not None else None
+
+    if new_df is None:
+        new_df = _read_assets(file_path)
+    with span('diff_assets'):
+        delta = diff_assets(previous[1], new_df) if previous is not None else None
+
+    if delta is not None:
+        delta['previous'] = os.path.basename(previous_key)
+        try:
+            with open(delta_path(file_path), 'w') as file:
+                json.dump(delta, file, default=str)
+        except OSError as e:
+            print(f"Could not write assets delta for {file_path}: {e}")
+
+    stale = []
+    with _frames_lock:
+        _frames[key] = (file_signature(file_path), new_df)
+        for name, (version, value, file_paths, updater) in list(_derived.items()):
+            if previous_key not in file_paths and key not in file_paths:
+                continue
+            if delta is None or updater is None:
+                del _derived[name]
+                continue
+            stale.append((name, value, file_paths, updater))
+
+    # Update outside the lock on copies; the updated value is swapped in under the new version
+    for name, value, file_paths, updater in stale:
+        file_paths = [key if path == previous_key else path for path in file_paths]
+        try:
+            with span(f'update_{name[0] if isinstance(name, tuple) else name}'):
+                value = updater(value, delta, new_df)
+        except Exception as e:
+            # The stale entry no longer matches any dataset version, so it is rebuilt on next use
+            print(f"Could not update {name} incrementally: {e}")
+            continue
+        with _frames_lock:
+            _derived[name] = (dataset_version(*file_paths), value, file_paths, updater)
+
+    # Only the latest assets export is kept in memory; the one it replaced is parsed again if asked for
+    with _frames_lock:
+        if previous_key is not None and previous_key != key:
+            _frames.pop(previous_key, None)
+            _path_locks.pop(previous_key, None)
+    _latest_assets = key
+
+    for listener in list(_invalidation_listeners):
+        listener(file_path)
+    return delta
+
+
+def invalidate(file_path=None):
+    """
+    Drops the cached DataFrame for file_path, or every cached DataFrame if no path is given.
+    Derived structures are dropped as well.
+    """
+    with _frames_lock:
+        if file_path is None:
+            _frames.clear()
+        else:
+            _frames.pop(os.path.abspath(file_path), None)
+        _derived.clear()
+
+    for listener in list(_invalidation_listeners):
+        listener(file_path)
+
+
+def on_invalidate(listener):
+    """
+    Registers a callback that is run with the file path whenever the store is invalidated.
+    """
+    _invalidation_listeners.append(listener)
+    return listener
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import date, timedelta
+from werkzeug.utils import secure_filename
+import datasets
+import jobs
+import store
+from configuration import get_config
+
+
+# Uploads larger than this are rejected while they are being written
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadError(ValueError):
+    """
+    Raised when an upload is rejected; the message is shown to the user.
+    """
+
+
+def save_upload(kind, file):
+    """
+    Streams an uploaded file into the uploads folder in chunks, enforcing MAX_UPLOAD_BYTES.
+
+    The file is written under a temporary name; ingest_upload moves it into place only once
+    it has been validated, so a rejected or interrupted upload never replaces the current
+    export. Only names of the kind's export (see store.UPLOAD_PATTERNS) are accepted.
+
+    Returns:
+        tuple: (file path, temporary path, size in bytes, SHA-256 hex digest)
+    """
+    filename = secure_filename(os.path.basename(file.filename or ''))
+    if not filename:
+        raise UploadError("No file uploaded")
+
+    prefix, extension = store.UPLOAD_PATTERNS[kind]
+    if not (filename.startswith(prefix) and filename.endswith(extension)):
+        raise UploadError(f"Expected a {prefix}*{extension} file, not {filename}.")
+
+    file_path = os.path.join(store.UPLOAD_FOLDER, filename)
+    temp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.part'
+    checksum = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(temp_path, 'wb') as output:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadError(f"File is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit.")
+                checksum.update(chunk)
+                output.write(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return file_path, temp_path, size, checksum.hexdigest()
+
+
+def ingest_upload(kind, file):
+    """
+    Saves an uploaded MyTeam ('myteam') or assets ('assets') export, parses and validates it,
+    registers it as the current export and starts warming the dashboard caches for it.
+
+    Returns:
+        dict: The upload summary for the response (size, checksum, rows, parse time, ...).
+
+    Raises:
+        UploadError: If the file is too large, has the wrong name, cannot be parsed or
+        lacks required columns.
+    """
+    from algorithms import REQUIRED_MYTEAM_COLUMNS, REQUIRED_ASSETS_COLUMNS, missing_columns
+
+    file_path, temp_path, size, checksum = save_upload(kind, file)
+    filename = os.path.basename(file_path)
+
+    # Validate the temporary file; the current export is only replaced once it passes
+    try:
+        start = time.perf_counter()
+        try:
+            df = datasets.read_upload(kind, temp_path)
+        except Exception as e:
+            raise UploadError(f"Could not read {filename}: {e}")
+        parse_seconds = time.perf_counter() - start
+
+        missing = missing_columns(df, REQUIRED_MYTEAM_COLUMNS if kind == 'myteam' else REQUIRED_ASSETS_COLUMNS)
+        if missing:
+            raise UploadError(f"{filename} is missing required columns: {', '.join(sorted(missing))}")
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    delta = None
+    if kind == 'myteam':
+        datasets.ingest_myteam(file_path, df)  # Also writes the columnar snapshot
+    else:
+        # Diff against the previous export and bring the dashboard indexes up to date
+        delta = datasets.ingest_assets(file_path, df)
+
+    merged = None
+    if kind == 'myteam':
+        # Merge the new export with the ones already uploaded and load the result
+        store.register_upload(kind, file_path)
+        myteam_file = store.merge_myteam_uploads()
+        if myteam_file != file_path:
+            merged = (len(datasets.merged_exports(myteam_file)), datasets.load_myteam(myteam_file))
+        store.import_myteam(myteam_file, df if merged is None else merged[1])
+    else:
+        store.import_assets(file_path, df)
+        # Backfill the asset history with earlier exports first, so this one is appended in order
+        store.archive_asset_uploads()
+        store.register_upload(kind, file_path)
+        store.archive_assets(file_path, df)
+
+    summary = {
+        "filename": os.path.basename(file_path),
+        "size": size,
+        "sha256": checksum,
+        "rows": len(df),
+        "columns": len(df.columns),
+        "parse_seconds": round(parse_seconds, 3)
+    }
+    if merged is not None:
+        summary["merged"] = {
+            "exports": merged[0],
+            "rows": len(merged[1])
+        }
+    if delta is not None:
+        summary["changes"] = {
+            "added": len(delta['added']),
+            "removed": len(delta['removed']),
+            "changed": len(delta['changed'])
+        }
+
+    # Build the indexes and aggregates the dashboard needs before the next page load asks for them
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
+    if myteam_file is not None and assets_file is not None:
+        key = ('warm_caches', datasets.dataset_version(myteam_file, assets_file))
+        summary["warm_job_id"] = jobs.submit(key, warm_caches, myteam_file, assets_file)
+    return summary
+
+
+def warm_caches(myteam_file, assets_file, progress):
+    """
+    Builds every derived structure the dashboard reads for the current uploads.
+    """
+    from algorithms import course_endings, device_index, monthly_device_counts, inventory_counts
+
+    config = get_config()
+
+    progress(0.1, 'Indexing courses')
+    this_thursday = date.today() + timedelta(days=(3 - date.today().weekday() + 7) % 7)
+    course_endings(assets_file, myteam_file, this_thursday)
+
+    progress(0.4, 'Indexing devices')
+    device_index(myteam_file, assets_file)
+
+    progress(0.7, 'Counting devices')
+    monthly_device_counts(myteam_file, config['include_course_types'])
+    inventory_counts(assets_file, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'])
+
+    store.ensure_loaded(myteam_file, assets_file)
+    return {"message": "Caches warmed."}
@@ -0,0 +1,131 @@
+from flask import Blueprint, jsonify
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import store
+from metrics import span
+
+# Create a Blueprint for job status routes
+jobs_bp = Blueprint('jobs', __name__)
+
+# Report generation runs here instead of inside the Flask request
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='report-job')
+
+# Finished jobs are kept for polling until this many newer jobs have finished
+MAX_FINISHED_JOBS = 50
+
+# A queued or running job older than this is assumed to have died with its worker;
+# it no longer absorbs identical requests and is reported as failed
+MAX_JOB_SECONDS = 3600
+
+# Job state lives in the shared store so any worker process can answer a status poll;
+# the lock only serializes the check-then-insert of submit() within this process
+_lock = threading.Lock()
+
+JOB_COLUMNS = ['id', 'status', 'progress', 'stage', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+
+
+def _key_hash(key):
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _set(job_id, **fields):
+    assignments = ', '.join(f'{column} = ?' for column in fields)
+    with store.connect() as connection:
+        connection.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', [*fields.values(), job_id])
+
+
+def _forget_old_jobs(connection):
+    connection.execute(
+        "DELETE FROM jobs WHERE status IN ('finished', 'failed') AND id NOT IN "
+        "(SELECT id FROM jobs WHERE status IN ('finished', 'failed') ORDER BY finished_at DESC LIMIT ?)",
+        (MAX_FINISHED_JOBS,)
+    )
+
+
+def _run(job_id, func, args, kwargs):
+    def progress(fraction, stage):
+        _set(job_id, progress=round(fraction, 2), stage=stage)
+
+    _set(job_id, status='running', started_at=time.time())
+    try:
+        with span(f'job_{func.__name__}'):
+            result = func(*args, progress=progress, **kwargs)
+        outcome = {'status': 'finished', 'progress': 1.0, 'stage': 'Done', 'result': json.dumps(result)}
+    except Exception as e:
+        outcome = {'status': 'failed', 'stage': 'Failed', 'error': str(e)}
+
+    _set(job_id, finished_at=time.time(), **outcome)
+    with store.connect() as connection:
+        _forget_old_jobs(connection)
+
+
+def submit(key, func, *args, **kwargs):
+    """
+    Queues func(*args, progress=..., **kwargs) on the job runner and returns its job ID.
+
+    func receives a progress(fraction, stage) callback and its return value, which must be
+    JSON-serializable, becomes the job result. If a job with the same key is still queued
+    or running in any worker, no new job is started and the ID of that job is returned instead.
+    """
+    key_hash = _key_hash(key)
+    now = time.time()
+
+    with _lock, store.connect() as connection:
+        # Take the write lock up front so two workers cannot both miss the in-flight job
+        connection.execute('BEGIN IMMEDIATE')
+        row = connection.execute(
+            "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running') AND created_at > ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (key_hash, now - MAX_JOB_SECONDS)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+        job_id = uuid.uuid4().hex
+        connection.execute(
+            "INSERT INTO jobs (id, key, status, progress, stage, created_at) VALUES (?, ?, 'queued', 0.0, 'Queued', ?)",
+            (job_id, key_hash, now)
+        )
+
+    executor.submit(_run, job_id, func, args, kwargs)
+    return job_id
+
+
+def get_job(job_id):
+    """
+    Returns the job's public fields, or None for an unknown job ID.
+
+    A job still queued or running after MAX_JOB_SECONDS is marked as failed first; nothing
+    is left to finish it, so it would otherwise be polled forever.
+    """
+    query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?"
+    row = store.connect().execute(query, (job_id,)).fetchone()
+    if row is None:
+        return None
+
+    job = dict(zip(JOB_COLUMNS, row))
+    now = time.time()
+    if job['status'] in ('queued', 'running') and job['created_at'] <= now - MAX_JOB_SECONDS:
+        with store.connect() as connection:
+            # The job may have finished in the meantime; only a still unfinished one is failed
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', stage = 'Failed', error = ?, finished_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                ("The job did not finish in time; its worker may have stopped.", now, job_id)
+            )
+            job = dict(zip(JOB_COLUMNS, connection.execute(query, (job_id,)).fetchone()))
+
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+
+@jobs_bp.route('/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job)
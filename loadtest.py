@@ -0,0 +1,136 @@
+"""
+Load test for the multi-worker serving mode (wsgi.py).
+
+Starts the dashboard with each worker count in turn, drives the dashboard and search
+routes with concurrent clients and prints one JSON line per (workers, route) with the
+throughput and latency percentiles.
+
+Usage:
+    python loadtest.py
+    python loadtest.py --workers 1 2 4 8 --concurrency 16 --duration 10
+"""
+import argparse
+import csv
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+
+def asset_ids():
+    # Search targets come from the current assets export
+    files = sorted(file for file in os.listdir('uploads') if file.startswith('assets') and file.endswith('.csv'))
+    if not files:
+        return ['L001']
+    with open(os.path.join('uploads', files[-1]), newline='') as file:
+        return [row['Asset ID'] for row in csv.DictReader(file) if row.get('Asset ID')]
+
+
+def make_routes(device_ids):
+    """
+    Returns route name -> function building a (method, path, body) request.
+    """
+    return {
+        'top_index': lambda: ('GET', '/top/', None),
+        'update_date': lambda: ('GET', f'/top/update_date?end_date=2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}', None),
+        'charts': lambda: ('GET', '/top/api/charts', None),
+        'search': lambda: ('POST', '/top/get_search_results', json.dumps({'deviceId': random.choice(device_ids)}))
+    }
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/top/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start within {timeout}s')
+
+
+def run_route(port, build_request, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while time.perf_counter() < stop_at:
+            method, path, body = build_request()
+            headers = {'Content-Type': 'application/json'} if body else {}
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 500
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure dashboard throughput per worker count.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per route.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--routes', nargs='+', default=None)
+    args = parser.parse_args()
+
+    routes = make_routes(asset_ids())
+    selected = args.routes or list(routes)
+
+    for workers in args.workers:
+        server = subprocess.Popen(
+            [sys.executable, 'wsgi.py', '--workers', str(workers), '--threads', str(args.threads), '--port', str(args.port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_ready(args.port)
+            for name in selected:
+                # Warm every worker's caches before measuring
+                run_route(args.port, routes[name], args.concurrency, 1.0)
+                result = run_route(args.port, routes[name], args.concurrency, args.duration)
+                print(json.dumps({'workers': workers, 'route': name, **result}), flush=True)
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,141 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, request
+
+
+# Request latencies and pipeline stage durations, exposed at /metrics in the Prometheus
+# text format. Every worker process keeps its own numbers, so each series carries the
+# worker's pid and a scrape shows the worker that answered it.
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Lines of the cProfile dump returned for ?profile=1
+PROFILE_LINES = 60
+
+
+class Histogram:
+    """
+    A thread-safe Prometheus histogram with a fixed set of label names.
+    """
+
+    def __init__(self, name, description, label_names, buckets):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """
+        Returns the histogram in the Prometheus text exposition format.
+        """
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, counts[:], total, count) for labels, (counts, total, count) in self._series.items())
+
+        for labels, counts, total, count in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_duration = Histogram(
+    'tmm_request_duration_seconds', 'Request latency by route, method and status.',
+    ('worker', 'route', 'method', 'status'), REQUEST_BUCKETS
+)
+stage_duration = Histogram(
+    'tmm_stage_duration_seconds', 'Duration of the parse, build, allocate and report stages.',
+    ('worker', 'stage'), STAGE_BUCKETS
+)
+
+# cProfile can only profile one request at a time
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def span(stage):
+    """
+    Times the enclosed block and records it under the given stage name.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe((os.getpid(), stage), time.perf_counter() - start)
+
+
+def start_request():
+    """
+    before_request hook: starts the request timer, and the profiler for ?profile=1.
+    """
+    g.request_start = time.perf_counter()
+    if request.args.get('profile') == '1' and _profile_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def finish_request(response):
+    """
+    after_request hook: records the request latency. For a profiled request the response
+    is replaced with the cProfile dump, sorted by cumulative time.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+
+    start = g.pop('request_start', None)
+    if start is not None:
+        # Label by route pattern rather than path, so IDs and file names do not add series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_duration.observe((os.getpid(), route, request.method, response.status_code), time.perf_counter() - start)
+
+    if profiler is None:
+        return response
+
+    output = io.StringIO()
+    output.write(f'{request.method} {request.full_path} -> {response.status}\n\n')
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return Response(output.getvalue(), mimetype='text/plain')
+
+
+def abandon_profile(exception=None):
+    """
+    teardown_request hook: stops a profiler that finish_request never reached.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    return '\n'.join([request_duration.render(), stage_duration.render()]) + '\n'
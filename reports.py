@@ -0,0 +1,160 @@
+import html
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+
+# Shared style objects, created once instead of per cell
+THIN_SIDE = Side(border_style="thin")
+THIN_BORDER = Border(left=THIN_SIDE, right=THIN_SIDE, top=THIN_SIDE, bottom=THIN_SIDE)
+
+
+def column_widths(df, padding=2):
+    """
+    Computes the 'double-click to auto-resize' width of every column from the DataFrame itself.
+
+    Each width is the length of the longest value (or header) as text, plus padding. Empty
+    cells count as 'None', like str() of an empty openpyxl cell.
+
+    Returns:
+        list: One width per column of df.
+    """
+    widths = []
+    for column in df.columns:
+        values = df[column].astype(object)
+        lengths = values.where(values.notna(), 'None').astype(str).str.len()
+        max_length = max(len(str(column)), int(lengths.max()) if len(lengths) else 0)
+        widths.append(max_length + padding)
+    return widths
+
+
+def write_report(df, file_path, sheet_title='Sheet', row_colors=None, borders=False, auto_width=True, header_format=False):
+    """
+    Streams a DataFrame to an .xlsx file with a write-only workbook.
+
+    Rows are written once, in order, and every distinct cell format is registered once as a
+    named style, so memory use does not grow with the number of cells already written.
+
+    Args:
+        df (DataFrame): The report data; missing values are written as empty cells.
+        file_path (str): Where to save the workbook.
+        sheet_title (str): Title of the only worksheet.
+        row_colors (list): Optional hex fill color (e.g. 'D9D9D9') per data row, or None for no fill.
+        borders (bool): Draw thin borders around every cell.
+        auto_width (bool): Size the columns to their longest value.
+        header_format (bool): Write the header bold and centred with thin borders, as
+            DataFrame.to_excel does.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+
+    def named_style(name, **formats):
+        style = NamedStyle(name=name, **formats)
+        wb.add_named_style(style)
+        return style.name
+
+    # Column widths must be set before the first row is written
+    if auto_width:
+        for col_num, width in enumerate(column_widths(df), 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = width
+
+    header_style = None
+    if header_format:
+        header_style = named_style(
+            'Report Header', font=Font(bold=True), border=THIN_BORDER,
+            alignment=Alignment(horizontal='center', vertical='top')
+        )
+    elif borders:
+        header_style = named_style('Report Header', border=THIN_BORDER)
+
+    header = []
+    for value in df.columns:
+        cell = WriteOnlyCell(ws, value=value)
+        if header_style is not None:
+            cell.style = header_style
+        header.append(cell)
+    ws.append(header)
+
+    # Register each distinct row format once as a named style and apply it by name;
+    # assigning style objects cell by cell re-hashes them each time
+    row_styles = {}
+    def row_style(color):
+        if color not in row_styles:
+            formats = {'border': THIN_BORDER} if borders else {}
+            if color is not None:
+                formats['fill'] = PatternFill(start_color=color, end_color=color, fill_type="solid")
+            row_styles[color] = named_style(f'Report Row {color or "Plain"}', **formats)
+        return row_styles[color]
+
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    for row_idx, row in enumerate(rows):
+        color = row_colors[row_idx] if row_colors is not None else None
+        if color is None and not borders:
+            ws.append(row)
+            continue
+
+        style = row_style(color)
+        cells = []
+        for value in row:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            cells.append(cell)
+        ws.append(cells)
+
+    wb.save(file_path)
+    return file_path
+
+
+def alternating_course_colors(courses, colors=('D9D9D9', 'FCE4D6')):
+    """
+    Maps each course to a fill color, alternating light gray and orange in order of first appearance.
+
+    Returns:
+        dict: Course -> hex color.
+    """
+    return {course: colors[i % len(colors)] for i, course in enumerate(pd.unique(courses))}
+
+
+def _display_value(value):
+    # Show values the way they read back from the saved workbook
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return html.escape(str(value), quote=False)
+
+
+def render_html_table(df, row_colors=None, table_attributes='class="excel-table"', th_style='', td_style=''):
+    """
+    Renders a report DataFrame as an HTML table in a single pass.
+
+    Args:
+        df (DataFrame): The report data.
+        row_colors (list): Optional hex background color per row, or None for no color.
+        table_attributes (str): Attributes of the <table> tag.
+        th_style (str): Inline style of the header cells.
+        td_style (str): Inline style of the body cells; a row color is added in front of it.
+
+    Returns:
+        str: The HTML table.
+    """
+    parts = [f'<table {table_attributes}>', '<thead><tr>']
+    parts.extend(f'<th style="{th_style}">{_display_value(column)}</th>' for column in df.columns)
+    parts.append('</tr></thead><tbody>')
+
+    rows = df.itertuples(index=False, name=None)
+    for row_idx, row in enumerate(rows):
+        color = row_colors[row_idx] if row_colors is not None else None
+        style = f'background-color: #{color}' if color else ''
+        if td_style:
+            style = f'{style}; {td_style}' if style else td_style
+
+        cell_open = f'<td style="{style}">'
+        parts.append('<tr>')
+        parts.extend(f'{cell_open}{_display_value(value)}</td>' for value in row)
+        parts.append('</tr>')
+
+    parts.append('</tbody></table>')
+    return ''.join(parts)
@@ -0,0 +1,186 @@
+import datetime
+import json
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+
+
+# Snapshots are uncompressed .npz archives stored next to the upload they were built from:
+#   __meta__         JSON (as uint8) with the source file signature and the column layout
+#   <n>.values       numeric / bool / datetime columns, memory-mapped on load
+#   <n>.codes        int32 dictionary codes of a string column (-1 for missing values)
+#   <n>.categories   the distinct strings of that column; for a column that mixes types,
+#                    each value as text behind a one-letter type tag (see MIXED_TYPES)
+# Nothing is pickled: snapshots live in the uploads folder and are read with allow_pickle=False.
+SNAPSHOT_SUFFIX = '.snapshot.npz'
+
+# Type tag -> (test, to text, from text) for the values a mixed column can hold, in the
+# order they are tested (bool before int, Timestamp before datetime before date)
+MIXED_TYPES = {
+    's': (lambda value: isinstance(value, str), str, str),
+    'b': (lambda value: isinstance(value, (bool, np.bool_)), lambda value: str(int(value)), lambda text: bool(int(text))),
+    'i': (lambda value: isinstance(value, (int, np.integer)), lambda value: str(int(value)), int),
+    'f': (lambda value: isinstance(value, (float, np.floating)), lambda value: repr(float(value)), float),
+    'T': (lambda value: isinstance(value, pd.Timestamp), lambda value: value.isoformat(), pd.Timestamp),
+    'D': (lambda value: isinstance(value, datetime.datetime), lambda value: value.isoformat(), datetime.datetime.fromisoformat),
+    'd': (lambda value: isinstance(value, datetime.date), lambda value: value.isoformat(), datetime.date.fromisoformat),
+    't': (lambda value: isinstance(value, datetime.time), lambda value: value.isoformat(), datetime.time.fromisoformat),
+}
+
+
+def snapshot_path(file_path):
+    """
+    Returns the path of the columnar snapshot kept next to an uploaded file.
+    """
+    return os.path.splitext(file_path)[0] + SNAPSHOT_SUFFIX
+
+
+def _source_signature(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _is_string_column(series):
+    if pd.api.types.is_string_dtype(series.dtype) and not pd.api.types.is_object_dtype(series.dtype):
+        return True
+    if not pd.api.types.is_object_dtype(series.dtype):
+        return False
+    values = series.dropna()
+    return values.map(type).eq(str).all()
+
+
+def _tagged_text(value):
+    for tag, (test, to_text, _) in MIXED_TYPES.items():
+        if test(value):
+            return tag + to_text(value)
+    raise ValueError(f"Cannot store a value of type {type(value).__name__} in a snapshot")
+
+
+def _untagged_value(text):
+    return MIXED_TYPES[text[0]][2](text[1:])
+
+
+def write_snapshot(df, file_path):
+    """
+    Writes df as a columnar snapshot of file_path.
+
+    String columns and columns that mix types are dictionary-encoded; numeric, bool and
+    datetime columns are stored as raw arrays so they can be memory-mapped when the
+    snapshot is read back.
+
+    Raises:
+        ValueError: If a column holds values of a type MIXED_TYPES cannot store.
+
+    Returns:
+        str: Path of the written snapshot.
+    """
+    arrays = {}
+    columns = []
+
+    for position, column in enumerate(df.columns):
+        series = df[column]
+        key = str(position)
+
+        if pd.api.types.is_datetime64_any_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            arrays[f'{key}.values'] = series.to_numpy()
+            columns.append({'name': column, 'kind': 'values'})
+        elif _is_string_column(series):
+            codes, categories = pd.factorize(series, use_na_sentinel=True)
+            arrays[f'{key}.codes'] = codes.astype(np.int32)
+            arrays[f'{key}.categories'] = np.asarray(categories, dtype=str)
+            columns.append({'name': column, 'kind': 'strings'})
+        else:
+            # Tagged text keeps 1, 1.0, True and '1' apart, which factorizing the values would not
+            tagged = series.map(_tagged_text, na_action='ignore')
+            codes, categories = pd.factorize(tagged, use_na_sentinel=True)
+            arrays[f'{key}.codes'] = codes.astype(np.int32)
+            arrays[f'{key}.categories'] = np.asarray(categories, dtype=str)
+            columns.append({'name': column, 'kind': 'mixed'})
+
+    meta = {'source': _source_signature(file_path), 'rows': len(df), 'columns': columns}
+    arrays['__meta__'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+
+    # Write to a temporary file first so readers never see a half-written snapshot
+    path = snapshot_path(file_path)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temp_path, path)
+    return path
+
+
+def _memory_map_members(path):
+    """
+    Memory-maps every uncompressed, non-object member of an .npz archive.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                continue
+
+            # Skip the local file header to find where the .npy member starts
+            file.seek(info.header_offset)
+            header = file.read(30)
+            name_length = int.from_bytes(header[26:28], 'little')
+            extra_length = int.from_bytes(header[28:30], 'little')
+            file.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            if dtype.hasobject:
+                continue
+
+            name = info.filename[:-len('.npy')]
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def read_snapshot(file_path):
+    """
+    Loads the snapshot of file_path.
+
+    Returns:
+        DataFrame: The snapshot data, or None when the snapshot is missing, unreadable,
+        or older than file_path.
+    """
+    path = snapshot_path(file_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        arrays = _memory_map_members(path)
+        meta = json.loads(bytes(arrays['__meta__']).decode('utf-8'))
+        if meta['source'] != _source_signature(file_path):
+            return None
+
+        data = {}
+        for position, column in enumerate(meta['columns']):
+            key = str(position)
+            if column['kind'] == 'values':
+                data[column['name']] = arrays[f'{key}.values']
+            elif column['kind'] in ('strings', 'mixed'):
+                codes = arrays[f'{key}.codes']
+                categories = arrays[f'{key}.categories'].astype(object)
+                if column['kind'] == 'mixed':
+                    categories = pd.array([_untagged_value(text) for text in categories], dtype=object).to_numpy()
+                values = np.full(len(codes), np.nan, dtype=object)
+                present = codes >= 0
+                values[present] = categories.take(codes[present])
+                data[column['name']] = values
+            else:
+                # Older snapshots pickled these columns; they are rebuilt from the upload instead
+                raise ValueError(f"unsupported column kind {column['kind']}")
+
+        return pd.DataFrame(data, columns=[column['name'] for column in meta['columns']])
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
@@ -0,0 +1,662 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from datasets import MERGED_MYTEAM_SUFFIX, file_signature, load_myteam, load_assets, write_merged_myteam
+from metrics import span
+
+
+# Local SQLite store shared by the three blueprints. It keeps the upload registry
+# (which MyTeam / assets export is current), the seats and assets of the current
+# exports, and the allocation results of the deployment lists, so none of that has
+# to be rediscovered from the uploads folder or rescanned from DataFrames.
+UPLOAD_FOLDER = 'uploads'
+DB_PATH = os.path.join(UPLOAD_FOLDER, 'dashboard.sqlite3')
+
+# Upload kind -> (file name prefix, extension) of the exports
+UPLOAD_PATTERNS = {
+    'myteam': ('SIN', '.xlsx'),
+    'assets': ('assets', '.csv')
+}
+
+# Once there is more than one MyTeam export, the dashboard reads all of them merged
+MERGED_MYTEAM = os.path.join(UPLOAD_FOLDER, 'SIN_merged' + MERGED_MYTEAM_SUFFIX)
+
+# Export time in MyTeam file names, e.g. SIN_ExportSeatsWithTraineesInfos_2025-01-16_03-08-39.xlsx
+EXPORT_TIME_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})')
+
+# Deployment lists whose allocations are kept; every generated list is stored as its own report
+MAX_REPORTS = 50
+
+# Unix time in assets export names, e.g. assets-2025-01-14-1736821245.csv
+SNAPSHOT_TIME_PATTERN = re.compile(r'-(\d{9,10})\.csv$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (kind, filename)
+);
+
+-- Which upload the seats / assets tables currently hold, and its file signature
+CREATE TABLE IF NOT EXISTS loaded (
+    kind TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS seats (
+    row INTEGER PRIMARY KEY,
+    course TEXT,
+    from_date TEXT,
+    to_date TEXT,
+    course_type TEXT,
+    seat_number INTEGER,
+    customer TEXT,
+    trainee_code TEXT,
+    trainee_firstname TEXT,
+    trainee_lastname TEXT
+);
+CREATE INDEX IF NOT EXISTS seats_course ON seats (course);
+CREATE INDEX IF NOT EXISTS seats_trainee_code ON seats (trainee_code);
+CREATE INDEX IF NOT EXISTS seats_from_date ON seats (from_date);
+
+CREATE TABLE IF NOT EXISTS assets (
+    row INTEGER PRIMARY KEY,
+    asset_id TEXT,
+    asset_name TEXT,
+    location TEXT,
+    status TEXT,
+    fsa TEXT,
+    last_activity TEXT
+);
+CREATE INDEX IF NOT EXISTS assets_asset_id ON assets (asset_id);
+CREATE INDEX IF NOT EXISTS assets_location ON assets (location);
+
+CREATE TABLE IF NOT EXISTS allocations (
+    report TEXT NOT NULL,
+    generated_at REAL NOT NULL,
+    row INTEGER NOT NULL,
+    course TEXT,
+    from_date TEXT,
+    to_date TEXT,
+    seat_number INTEGER,
+    customer TEXT,
+    trainee_firstname TEXT,
+    trainee_lastname TEXT,
+    laptop TEXT,
+    ipad TEXT,
+    fsa TEXT,
+    PRIMARY KEY (report, row)
+);
+CREATE INDEX IF NOT EXISTS allocations_course ON allocations (course);
+CREATE INDEX IF NOT EXISTS allocations_laptop ON allocations (laptop);
+CREATE INDEX IF NOT EXISTS allocations_ipad ON allocations (ipad);
+
+-- Location and status history of every asset across the archived assets exports (see
+-- archive_assets). Rows are only ever added, and only for assets that changed. An export
+-- is keyed by its file signature, so one re-uploaded under the same name is archived again.
+CREATE TABLE IF NOT EXISTS asset_snapshots (
+    filename TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    snapshot_ts REAL NOT NULL UNIQUE,
+    rows INTEGER NOT NULL,
+    changes INTEGER NOT NULL,
+    PRIMARY KEY (filename, mtime_ns, size)
+);
+
+CREATE TABLE IF NOT EXISTS asset_history (
+    asset_id TEXT NOT NULL,
+    snapshot_ts REAL NOT NULL,
+    location TEXT,
+    status TEXT,
+    present INTEGER NOT NULL,
+    PRIMARY KEY (asset_id, snapshot_ts)
+) WITHOUT ROWID;
+
+-- Report jobs (see jobs.py); result is the JSON-encoded return value of the job
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL,
+    stage TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at);
+"""
+
+# SQLite limits the number of bound parameters per statement
+MAX_PARAMETERS = 500
+
+_local = threading.local()
+_import_lock = threading.Lock()
+
+# Process that has brought the asset history up to date with the uploads folder (see ensure_asset_history)
+_history_lock = threading.Lock()
+_history_pid = None
+
+
+def connect():
+    """
+    Returns this thread's connection to the store, creating the database on first use.
+
+    Connections are never shared between threads or between worker processes; a worker
+    forked from a process that already had a connection opens its own.
+    """
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.pid != os.getpid():
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        connection = sqlite3.connect(DB_PATH, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+        _local.pid = os.getpid()
+    return connection
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), MAX_PARAMETERS):
+        yield values[start:start + MAX_PARAMETERS]
+
+
+def _placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+def _sql_values(series):
+    # NaN / NaT become NULL, numpy scalars become plain Python values
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _sql_dates(series):
+    from algorithms import to_datetime_column
+
+    # Dates are stored as ISO text so they sort and compare correctly in SQL
+    return _sql_values(to_datetime_column(series).dt.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def register_upload(kind, file_path):
+    """
+    Records file_path as the current upload of the given kind ('myteam' or 'assets').
+    """
+    with connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO uploads (kind, filename, uploaded_at) VALUES (?, ?, ?)',
+            (kind, os.path.basename(file_path), time.time())
+        )
+
+
+def _discover_uploads(kind):
+    # Register exports that were copied into the uploads folder by hand, oldest first
+    prefix, extension = UPLOAD_PATTERNS[kind]
+    if not os.path.isdir(UPLOAD_FOLDER):
+        return
+    files = [file for file in os.listdir(UPLOAD_FOLDER) if file.startswith(prefix) and file.endswith(extension)]
+    files.sort(key=lambda file: os.path.getmtime(os.path.join(UPLOAD_FOLDER, file)))
+
+    with connect() as connection:
+        connection.executemany(
+            'INSERT OR IGNORE INTO uploads (kind, filename, uploaded_at) VALUES (?, ?, ?)',
+            [(kind, file, os.path.getmtime(os.path.join(UPLOAD_FOLDER, file))) for file in files]
+        )
+
+
+def _uploads(kind):
+    # Paths of the registered uploads of a kind that still exist, most recent upload first
+    query = 'SELECT filename FROM uploads WHERE kind = ? ORDER BY uploaded_at DESC'
+    filenames = [filename for (filename,) in connect().execute(query, (kind,))]
+    if not filenames:
+        _discover_uploads(kind)
+        filenames = [filename for (filename,) in connect().execute(query, (kind,))]
+
+    file_paths = [os.path.join(UPLOAD_FOLDER, filename) for filename in filenames]
+    return [file_path for file_path in file_paths if os.path.isfile(file_path)]
+
+
+def latest_upload(kind):
+    """
+    Returns the path of the most recent upload of the given kind that still exists, or None.
+
+    For 'myteam' this is the merged dataset of all exports once there is more than one
+    (see merge_myteam_uploads).
+    """
+    if kind == 'myteam' and os.path.isfile(MERGED_MYTEAM):
+        return MERGED_MYTEAM
+
+    file_paths = _uploads(kind)
+    return file_paths[0] if file_paths else None
+
+
+def export_time(file_path):
+    """
+    Returns when a MyTeam export was taken, from its file name, or else the file's mtime.
+    """
+    match = EXPORT_TIME_PATTERN.search(os.path.basename(file_path))
+    if match is not None:
+        try:
+            return datetime.strptime(match.group(1), '%Y-%m-%d_%H-%M-%S').timestamp()
+        except ValueError:
+            pass
+    return os.path.getmtime(file_path)
+
+
+def merge_myteam_uploads():
+    """
+    Combines every MyTeam export in the uploads folder into one dataset.
+
+    Exports often cover overlapping date windows; the merged dataset has each course as
+    the newest export that has it lists it (see datasets.merge_myteam). With a single export
+    there is nothing to merge and that export is used as it is.
+
+    Returns:
+        str: The path the dashboard now reads MyTeam data from, or None without any export.
+    """
+    file_paths = sorted(_uploads('myteam'), key=export_time, reverse=True)
+    if len(file_paths) < 2:
+        if os.path.exists(MERGED_MYTEAM):
+            os.remove(MERGED_MYTEAM)
+        return file_paths[0] if file_paths else None
+
+    write_merged_myteam(MERGED_MYTEAM, file_paths)
+    return MERGED_MYTEAM
+
+
+def _is_loaded(connection, kind, file_path):
+    _, mtime_ns, size = file_signature(file_path)
+    row = connection.execute('SELECT filename, mtime_ns, size FROM loaded WHERE kind = ?', (kind,)).fetchone()
+    return row == (os.path.basename(file_path), mtime_ns, size)
+
+
+def _mark_loaded(connection, kind, file_path, rows):
+    _, mtime_ns, size = file_signature(file_path)
+    connection.execute(
+        'INSERT OR REPLACE INTO loaded (kind, filename, mtime_ns, size, rows) VALUES (?, ?, ?, ?, ?)',
+        (kind, os.path.basename(file_path), mtime_ns, size, rows)
+    )
+
+
+def import_myteam(file_path, df=None):
+    """
+    Replaces the seats table with the rows of a MyTeam export.
+
+    Args:
+        file_path (str): The MyTeam export.
+        df (DataFrame): Its parsed rows; loaded through the dataset store if not given.
+    """
+    if df is None:
+        df = load_myteam(file_path)
+
+    def column(name):
+        return _sql_values(df[name]) if name in df.columns else [None] * len(df)
+
+    rows = list(zip(
+        range(len(df)),
+        column('Course'),
+        _sql_dates(df['From']) if 'From' in df.columns else [None] * len(df),
+        _sql_dates(df['To']) if 'To' in df.columns else [None] * len(df),
+        column('Course Type'),
+        column('Seat Number'),
+        column('Customer'),
+        column('Trainee Code'),
+        column('Trainee Firstname'),
+        column('Trainee Lastname')
+    ))
+
+    with _import_lock, connect() as connection, span('import_seats'):
+        connection.execute('DELETE FROM seats')
+        connection.executemany('INSERT INTO seats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        _mark_loaded(connection, 'myteam', file_path, len(rows))
+
+
+def import_assets(file_path, df=None):
+    """
+    Replaces the assets table with the rows of an assets export.
+
+    Args:
+        file_path (str): The assets export.
+        df (DataFrame): Its parsed rows; loaded through the dataset store if not given.
+    """
+    if df is None:
+        df = load_assets(file_path)
+
+    def column(name):
+        return _sql_values(df[name]) if name in df.columns else [None] * len(df)
+
+    rows = list(zip(
+        range(len(df)),
+        column('Asset ID'),
+        column('Asset Name'),
+        column('Location'),
+        column('Status'),
+        column('FSA'),
+        column('Last Activity')
+    ))
+
+    with _import_lock, connect() as connection, span('import_assets'):
+        connection.execute('DELETE FROM assets')
+        connection.executemany('INSERT INTO assets VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        _mark_loaded(connection, 'assets', file_path, len(rows))
+
+
+def ensure_loaded(myteam_file, assets_file):
+    """
+    Imports the given exports into the seats and assets tables unless they already hold them.
+    """
+    connection = connect()
+    if not _is_loaded(connection, 'myteam', myteam_file):
+        import_myteam(myteam_file)
+    if not _is_loaded(connection, 'assets', assets_file):
+        import_assets(assets_file)
+
+
+def device_index(myteam_file, assets_file, device_ids):
+    """
+    Looks up everything needed to answer searches for device_ids with indexed queries.
+
+    Returns:
+        dict: The same layout as algorithms.build_device_index, limited to the given devices,
+        their locations, the courses at those locations and the trainees of those courses.
+    """
+    import pandas as pd
+
+    ensure_loaded(myteam_file, assets_file)
+    connection = connect()
+
+    # The first row of an Asset ID wins, as in the assets export
+    asset_location = {}
+    for ids in _chunks(set(device_ids)):
+        asset_location.update(connection.execute(
+            f'SELECT asset_id, location FROM assets WHERE row IN '
+            f'(SELECT MIN(row) FROM assets WHERE asset_id IN ({_placeholders(ids)}) GROUP BY asset_id)',
+            ids
+        ))
+
+    locations = {location for location in asset_location.values() if location is not None and location.startswith('SIN')}
+    location_assets = {}
+    course_start = {}
+    for chunk in _chunks(locations):
+        for location, asset_id in connection.execute(
+            f'SELECT location, asset_id FROM assets WHERE location IN ({_placeholders(chunk)}) ORDER BY row',
+            chunk
+        ):
+            location_assets.setdefault(location, []).append(asset_id)
+
+        for course, from_date, trainee_code in connection.execute(
+            f'SELECT course, from_date, trainee_code FROM seats WHERE row IN '
+            f'(SELECT MIN(row) FROM seats WHERE course IN ({_placeholders(chunk)}) GROUP BY course)',
+            chunk
+        ):
+            course_start[course] = (pd.Timestamp(from_date) if from_date is not None else pd.NaT, trainee_code)
+
+    trainee_latest_to = {}
+    trainee_codes = {trainee_code for _, trainee_code in course_start.values() if trainee_code is not None}
+    for chunk in _chunks(trainee_codes):
+        for trainee_code, to_date in connection.execute(
+            f'SELECT trainee_code, MAX(to_date) FROM seats WHERE trainee_code IN ({_placeholders(chunk)}) GROUP BY trainee_code',
+            chunk
+        ):
+            trainee_latest_to[trainee_code] = pd.Timestamp(to_date) if to_date is not None else pd.NaT
+
+    return {
+        "asset_location": asset_location,
+        "location_assets": location_assets,
+        "course_start": course_start,
+        "trainee_latest_to": trainee_latest_to
+    }
+
+
+def save_allocations(report, report_df):
+    """
+    Stores the rows of a deployment list (see algorithms.process_excel) under the report name,
+    replacing any earlier run of the same report. Only the MAX_REPORTS newest reports are kept.
+    """
+    import pandas as pd
+
+    def column(name):
+        return _sql_values(report_df[name]) if name in report_df.columns else [None] * len(report_df)
+
+    def dates(name):
+        if name not in report_df.columns:
+            return [None] * len(report_df)
+        return _sql_dates(pd.to_datetime(report_df[name], format='%d-%b-%y'))
+
+    generated_at = time.time()
+    rows = list(zip(
+        [report] * len(report_df),
+        [generated_at] * len(report_df),
+        range(len(report_df)),
+        column('Course'),
+        dates('From'),
+        dates('To'),
+        column('Seat Number'),
+        column('Customer'),
+        column('Trainee Firstname'),
+        column('Trainee Lastname'),
+        column('Staff ID(Lenovo Yoga)'),
+        column('Staff ID(Apple iPad)'),
+        column('FSA')
+    ))
+
+    with connect() as connection:
+        connection.execute('DELETE FROM allocations WHERE report = ?', (report,))
+        connection.executemany('INSERT INTO allocations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        connection.execute(
+            'DELETE FROM allocations WHERE report NOT IN '
+            '(SELECT report FROM allocations GROUP BY report ORDER BY MAX(generated_at) DESC LIMIT ?)',
+            (MAX_REPORTS,)
+        )
+
+
+def find_allocations(course=None, asset_id=None):
+    """
+    Returns the stored allocation rows for a course and/or a laptop or iPad, newest report first.
+    """
+    conditions = []
+    parameters = []
+    if course:
+        conditions.append('course = ?')
+        parameters.append(course)
+    if asset_id:
+        conditions.append('(laptop = ? OR ipad = ?)')
+        parameters.extend([asset_id, asset_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    cursor = connect().execute(
+        f'SELECT report, generated_at, course, from_date, to_date, seat_number, customer, trainee_firstname, '
+        f'trainee_lastname, laptop, ipad, fsa FROM allocations {where} ORDER BY generated_at DESC, row',
+        parameters
+    )
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def snapshot_time(file_path):
+    """
+    Returns when an assets export was taken, from the Unix time in its file name
+    (assets-2025-01-14-1736821245.csv), or else the file's mtime.
+    """
+    match = SNAPSHOT_TIME_PATTERN.search(os.path.basename(file_path))
+    if match is not None:
+        return float(match.group(1))
+    return os.path.getmtime(file_path)
+
+
+def _asset_states(connection, when, inclusive=True):
+    # Latest archived row of every asset up to when: Asset ID -> (location, status, present)
+    operator = '<=' if inclusive else '<'
+    return {
+        asset_id: (location, status, present)
+        for asset_id, location, status, present in connection.execute(
+            f'SELECT asset_id, location, status, present FROM asset_history JOIN '
+            f'(SELECT asset_id, MAX(snapshot_ts) AS snapshot_ts FROM asset_history WHERE snapshot_ts {operator} ? GROUP BY asset_id) '
+            f'USING (asset_id, snapshot_ts)',
+            (when,)
+        )
+    }
+
+
+def archive_assets(file_path, df):
+    """
+    Adds an assets export to the asset history.
+
+    The history is append-only and delta-encoded: for each export it holds a row only for
+    the assets whose location, status or presence differ from the archived state just
+    before the export was taken. An export older than ones already archived is slotted in
+    by time; the assets it changes get their previous state back at the next export,
+    unless that export has a row of its own for them.
+
+    Args:
+        file_path (str): The assets export; its name and signature key the archive, so each
+            version of the file is archived once.
+        df (DataFrame): Its parsed rows.
+
+    Returns:
+        int: The number of history rows written, or None if the export was archived before.
+    """
+    # The first row of an Asset ID wins, as in the device search
+    rows = df.dropna(subset=['Asset ID']).drop_duplicates(subset='Asset ID')
+    current = dict(zip(
+        rows['Asset ID'].astype(str).tolist(),
+        zip(_sql_values(rows['Location']), _sql_values(rows['Status']) if 'Status' in rows.columns else [None] * len(rows), [1] * len(rows))
+    ))
+    _, mtime_ns, size = file_signature(file_path)
+    signature = (os.path.basename(file_path), mtime_ns, size)
+    snapshot_ts = snapshot_time(file_path)
+
+    with _import_lock, connect() as connection, span('archive_assets'):
+        connection.execute('BEGIN IMMEDIATE')
+        if connection.execute(
+            'SELECT 1 FROM asset_snapshots WHERE filename = ? AND mtime_ns = ? AND size = ?', signature
+        ).fetchone() is not None:
+            return None
+        # Two exports taken in the same second still get their own place in time
+        while connection.execute('SELECT 1 FROM asset_snapshots WHERE snapshot_ts = ?', (snapshot_ts,)).fetchone() is not None:
+            snapshot_ts += 0.001
+
+        previous = _asset_states(connection, snapshot_ts, inclusive=False)
+        changes = {asset_id: state for asset_id, state in current.items() if previous.get(asset_id) != state}
+        changes.update({
+            asset_id: (None, None, 0) for asset_id, (location, status, present) in previous.items()
+            if present and asset_id not in current
+        })
+
+        history = [(asset_id, snapshot_ts, *state) for asset_id, state in changes.items()]
+        (next_ts,) = connection.execute('SELECT MIN(snapshot_ts) FROM asset_snapshots WHERE snapshot_ts > ?', (snapshot_ts,)).fetchone()
+        if next_ts is not None and changes:
+            recorded = {asset_id for (asset_id,) in connection.execute('SELECT asset_id FROM asset_history WHERE snapshot_ts = ?', (next_ts,))}
+            history += [
+                (asset_id, next_ts, *previous.get(asset_id, (None, None, 0)))
+                for asset_id in changes if asset_id not in recorded
+            ]
+
+        connection.executemany('INSERT INTO asset_history VALUES (?, ?, ?, ?, ?)', history)
+        connection.execute(
+            'INSERT INTO asset_snapshots (filename, mtime_ns, size, snapshot_ts, rows, changes) VALUES (?, ?, ?, ?, ?, ?)',
+            (*signature, snapshot_ts, len(current), len(changes))
+        )
+    return len(history)
+
+
+def archive_asset_uploads():
+    """
+    Archives every assets export in the uploads folder that is not in the asset history yet,
+    oldest first. Each version of an export is read once; later queries only use the history.
+
+    Called on the upload path, and once per process by ensure_asset_history.
+    """
+    import pandas as pd
+
+    archived = set(connect().execute('SELECT filename, mtime_ns, size FROM asset_snapshots'))
+    pending = [
+        file_path for file_path in _uploads('assets')
+        if (os.path.basename(file_path), *file_signature(file_path)[1:]) not in archived
+    ]
+    for file_path in sorted(pending, key=snapshot_time):
+        try:
+            df = pd.read_csv(file_path, usecols=lambda column: column.strip() in ('Asset ID', 'Location', 'Status'))
+            df.columns = df.columns.str.strip()
+            archive_assets(file_path, df)
+        except (OSError, ValueError) as e:
+            print(f"Could not archive {file_path}: {e}")
+
+
+def ensure_asset_history():
+    """
+    Archives the assets exports already in the uploads folder the first time this process
+    reads the asset history, so an install whose exports predate the history still finds
+    them. Uploads keep the history up to date after that, so later reads never parse an export.
+    """
+    global _history_pid
+    with _history_lock:
+        if _history_pid == os.getpid():
+            return
+        archive_asset_uploads()
+        _history_pid = os.getpid()
+
+
+def _snapshot_label(snapshot_ts):
+    return datetime.fromtimestamp(snapshot_ts).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def asset_states(when):
+    """
+    Returns the archived state of every asset as of when (a Unix time).
+
+    Returns:
+        tuple: (time of the latest export taken up to when, or None if there is none,
+        {Asset ID: (Location, Status)} of the assets in that export)
+    """
+    connection = connect()
+    (snapshot_ts,) = connection.execute('SELECT MAX(snapshot_ts) FROM asset_snapshots WHERE snapshot_ts <= ?', (when,)).fetchone()
+    if snapshot_ts is None:
+        return None, {}
+
+    states = _asset_states(connection, when)
+    return snapshot_ts, {asset_id: (location, status) for asset_id, (location, status, present) in states.items() if present}
+
+
+def asset_timeline(asset_id):
+    """
+    Returns the locations an asset has been at, oldest first, from the asset history.
+
+    Each entry has 'Location' (None while the asset was missing from the exports), 'From'
+    (the first export it was seen there in), 'To' (the first export it had moved in, or
+    None if it is still there) and 'Days' (to 'To', or to now).
+    """
+    rows = connect().execute(
+        'SELECT snapshot_ts, location, present FROM asset_history WHERE asset_id = ? ORDER BY snapshot_ts',
+        (asset_id,)
+    ).fetchall()
+
+    # Status changes have rows of their own; consecutive rows at one location are one stay
+    stays = []
+    for snapshot_ts, location, present in rows:
+        location = location if present else None
+        if stays and stays[-1][1] == location:
+            continue
+        stays.append((snapshot_ts, location))
+
+    now = time.time()
+    timeline = []
+    for position, (start, location) in enumerate(stays):
+        end = stays[position + 1][0] if position + 1 < len(stays) else None
+        timeline.append({
+            'Location': location,
+            'From': _snapshot_label(start),
+            'To': _snapshot_label(end) if end is not None else None,
+            'Days': round(((end if end is not None else now) - start) / 86400, 1)
+        })
+    return timeline
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The app is a set of top-level modules; make them importable from the tests
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Sample exports shipped in uploads/
+SAMPLE_MYTEAM = os.path.join(ROOT, 'uploads', 'SIN_ExportSeatsWithTraineesInfos_2025-01-16_03-08-39.xlsx')
+SAMPLE_ASSETS = os.path.join(ROOT, 'uploads', 'assets-2025-01-14-1736821245.csv')
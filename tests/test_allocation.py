@@ -0,0 +1,111 @@
+import json
+import os
+import pandas as pd
+import pytest
+import algorithms
+from conftest import ROOT, SAMPLE_ASSETS, SAMPLE_MYTEAM
+
+
+def original_allocation(courses_df, laptops_df, eligible_ipads, rsaf_laptops, a380_laptops, cannot_assign_laptops):
+    """
+    The row-by-row allocation process_excel used before allocate_laptops and allocate_ipads,
+    kept as the reference they must match.
+    """
+    df = courses_df.copy()
+    df['Staff ID(Lenovo Yoga)'] = None
+    df['Staff ID(Apple iPad)'] = None
+    df['FSA'] = None
+
+    for i, row in df.iterrows():
+        if row['Customer'] == '99Y':
+            filtered_laptops = laptops_df[laptops_df['Asset ID'].isin(rsaf_laptops)]
+        elif row['Course Type'].startswith('L') and row['Customer'] == 'SIA':
+            filtered_laptops = laptops_df[laptops_df['Asset ID'].isin(a380_laptops)]
+        else:
+            filtered_laptops = laptops_df[
+                ~laptops_df['Asset ID'].isin(rsaf_laptops) &
+                ~laptops_df['Asset ID'].isin(a380_laptops) &
+                ~laptops_df['Asset ID'].isin(cannot_assign_laptops)
+            ]
+
+        for _, laptop_row in filtered_laptops.iterrows():
+            laptop = laptop_row['Asset ID']
+            if laptop not in df['Staff ID(Lenovo Yoga)'].values:
+                df.at[i, 'Staff ID(Lenovo Yoga)'] = laptop
+                df.at[i, 'FSA'] = laptop_row['FSA']
+                break
+
+    ipad_index = 0
+    for i, row in df.iterrows():
+        if row['Course Type'][0] in ['E', 'G'] and row['Customer'] != '99Y':
+            if ipad_index < len(eligible_ipads):
+                df.at[i, 'Staff ID(Apple iPad)'] = eligible_ipads[ipad_index]
+                ipad_index += 1
+
+    return df['Staff ID(Lenovo Yoga)'].tolist(), df['FSA'].tolist(), df['Staff ID(Apple iPad)'].tolist()
+
+
+def assert_same_allocation(courses_df, laptops_df, eligible_ipads, rsaf_laptops, a380_laptops, cannot_assign_laptops):
+    expected = original_allocation(courses_df, laptops_df, eligible_ipads, rsaf_laptops, a380_laptops, cannot_assign_laptops)
+
+    laptop_ids, laptop_fsas = algorithms.allocate_laptops(courses_df, laptops_df, rsaf_laptops, a380_laptops, cannot_assign_laptops)
+    ipad_ids = algorithms.allocate_ipads(courses_df, eligible_ipads)
+
+    assert (laptop_ids, laptop_fsas, ipad_ids) == expected
+    return laptop_ids
+
+
+def sample_inputs(include_course_types):
+    # Prepared the way process_excel prepares them, without the date filter
+    courses_df = algorithms.load_myteam(SAMPLE_MYTEAM)
+    courses_df = courses_df[courses_df['Course Nature Code'] != 'dry']
+    if include_course_types is not None:
+        courses_df = courses_df[courses_df['Course Type'].isin(include_course_types)]
+    courses_df = courses_df.sort_values(by=['From', 'Course'], kind='stable')[['Course', 'From', 'Course Type', 'Customer']]
+
+    assets_df = algorithms.load_assets(SAMPLE_ASSETS)[['Asset ID', 'Location', 'FSA']]
+    assets_df = assets_df.sort_values(by=['FSA', 'Asset ID'], ascending=[False, True])
+    in_store = assets_df['Location'] == 'M01-13'
+    laptops_df = assets_df[in_store & assets_df['Asset ID'].str.startswith('L') & assets_df['FSA'].notna() & (assets_df['FSA'] != 'NIL')]
+    ipads = assets_df.loc[in_store & assets_df['Asset ID'].str.startswith('AIP'), 'Asset ID'].tolist()
+    return courses_df, laptops_df, ipads
+
+
+@pytest.mark.parametrize('all_course_types', [False, True])
+def test_allocation_matches_the_original_on_the_samples(all_course_types):
+    with open(os.path.join(ROOT, 'config.json')) as file:
+        config = json.load(file)
+
+    courses_df, laptops_df, ipads = sample_inputs(None if all_course_types else config['include_course_types'])
+    eligible_ipads = [ipad for ipad in ipads if ipad not in config['cannot_assign_ipads']]
+
+    laptop_ids = assert_same_allocation(
+        courses_df, laptops_df, eligible_ipads,
+        config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']
+    )
+    assert any(laptop_ids)
+
+
+def test_allocation_matches_the_original_with_overlapping_rsaf_and_a380_lists():
+    laptops_df = pd.DataFrame({
+        'Asset ID': [f'L{number:03d}' for number in range(1, 21)],
+        'FSA': [2413 - number % 3 for number in range(1, 21)],
+    })
+    rsaf_laptops = ['L001', 'L002', 'L003', 'L004', 'L005', 'L006']
+    a380_laptops = ['L004', 'L005', 'L006', 'L007', 'L008']  # L004-L006 are in both lists
+    cannot_assign_laptops = ['L003', 'L007', 'L012', 'L013']
+
+    # RSAF and A380 seats alternate so both pools draw on the shared laptops, and every pool runs out
+    seats = []
+    for course in range(6):
+        seats += [
+            (f'C{course}R', '99Y', 'GFC4A499Y'),
+            (f'C{course}A', 'SIA', 'LFA380'),
+            (f'C{course}G', 'SIA', 'EF47P1'),
+            (f'C{course}G', 'KAL', 'VFQGA2'),
+        ]
+    courses_df = pd.DataFrame(seats, columns=['Course', 'Customer', 'Course Type'], index=range(100, 100 + len(seats)))
+    eligible_ipads = ['AIP001', 'AIP002', 'AIP003']
+
+    laptop_ids = assert_same_allocation(courses_df, laptops_df, eligible_ipads, rsaf_laptops, a380_laptops, cannot_assign_laptops)
+    assert None in laptop_ids
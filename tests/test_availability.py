@@ -0,0 +1,35 @@
+from datetime import date
+import pandas as pd
+import algorithms
+
+
+def calendar():
+    myteam_df = pd.DataFrame({
+        'Course': ['SIN-RUNNING', 'SIN-LATER'],
+        'From': pd.to_datetime(['2025-03-03', '2025-03-17']),
+        'To': pd.to_datetime(['2025-03-07', '2025-03-21']),
+        'Trainee Code': ['T1', 'T2'],
+    })
+    assets_df = pd.DataFrame({
+        'Asset ID': ['L1', 'L2', 'L3', 'L4', 'L5', 'L6', 'AIP1'],
+        'Location': ['M01-13', 'SIN-RUNNING', 'SIN-LATER', 'M01-13', 'M01-13', 'M01-13', 'M01-13'],
+        'Status': ['Ready', 'Ready', 'Ready', 'Repair', 'Ready', 'Ready', 'Ready'],
+        'FSA': ['A', 'B', 'C', 'D', 'NIL', 'F', None],
+    })
+    return algorithms.build_availability_calendar(myteam_df, assets_df)
+
+
+def test_free_devices_checks_both_ends_of_the_period():
+    # L2 is back on 8 Mar; L3 is out from 17 Mar
+    assert algorithms.free_devices(calendar(), date(2025, 3, 4), date(2025, 3, 10)) == ['L1', 'L6', 'L3']
+    assert algorithms.free_devices(calendar(), date(2025, 3, 10), date(2025, 3, 18)) == ['L1', 'L6', 'L2']
+
+
+def test_free_devices_only_lists_what_the_allocator_hands_out():
+    included, excluded = algorithms.device_pool('laptops', 'General', ['L6'], [], [], [])
+    assert algorithms.free_devices(calendar(), date(2025, 3, 10), date(2025, 3, 10), 'laptops', included, excluded) == ['L1', 'L2', 'L3']
+
+    included, excluded = algorithms.device_pool('laptops', 'RSAF', ['L6'], [], [], [])
+    assert algorithms.free_devices(calendar(), date(2025, 3, 10), date(2025, 3, 10), 'laptops', included, excluded) == ['L6']
+
+    assert algorithms.free_devices(calendar(), date(2025, 3, 10), date(2025, 3, 10), 'ipads') == ['AIP1']
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import pandas as pd
+import datasets
+
+
+def export(rows):
+    return pd.DataFrame(rows, columns=['Course', 'From', 'To', 'Seat Number', 'Trainee Code'])
+
+
+def test_merge_myteam_takes_named_seats_from_the_newer_export():
+    old = export([
+        ['C1', '2025-02-03', '2025-02-07', 1, np.nan],
+        ['C1', '2025-02-03', '2025-02-07', 2, np.nan],
+    ])
+    new = export([
+        ['C1', '2025-02-03', '2025-02-07', 1, 'T1'],
+        ['C1', '2025-02-03', '2025-02-07', 2, np.nan],
+    ])
+
+    merged = datasets.merge_myteam([new, old])
+
+    assert merged['Seat Number'].tolist() == [1, 2]
+    assert merged['Trainee Code'].tolist()[0] == 'T1'
+
+
+def test_merge_myteam_drops_seats_and_courses_the_newer_export_no_longer_lists():
+    old = export([
+        ['C1', '2025-02-03', '2025-02-07', 1, 'T1'],
+        ['C1', '2025-02-03', '2025-02-07', 2, 'T2'],
+        ['C2', '2025-02-10', '2025-02-14', 1, 'T3'],  # Cancelled since
+        ['C3', '2025-01-06', '2025-01-10', 1, 'T4'],  # Before the newer export's dates
+    ])
+    new = export([
+        ['C1', '2025-02-03', '2025-02-07', 1, 'T1'],
+        ['C4', '2025-02-17', '2025-02-21', 1, 'T5'],
+    ])
+
+    merged = datasets.merge_myteam([new, old])
+
+    assert list(zip(merged['Course'], merged['Seat Number'])) == [('C1', 1), ('C4', 1), ('C3', 1)]
+
+
+def test_merge_myteam_keeps_repeated_rows_of_an_export():
+    old = export([['C1', '2025-02-03', '2025-02-07', 1, np.nan]])
+    new = export([
+        ['C1', '2025-02-03', '2025-02-07', 1, np.nan],
+        ['C1', '2025-02-03', '2025-02-07', 1, np.nan],
+    ])
+
+    assert len(datasets.merge_myteam([new, old])) == 2
+
+
+def test_ingest_assets_keeps_only_the_latest_export_in_memory(tmp_path):
+    datasets.invalidate()
+    first, second = tmp_path / 'assets-1.csv', tmp_path / 'assets-2.csv'
+    pd.DataFrame({'Asset ID': ['L1', 'L2'], 'Location': ['A', 'B']}).to_csv(first, index=False)
+    pd.DataFrame({'Asset ID': ['L1', 'L3'], 'Location': ['C', 'B']}).to_csv(second, index=False)
+
+    datasets.load_assets(str(first))
+    assert os.path.abspath(first) in datasets._path_locks
+    delta = datasets.ingest_assets(str(second))
+
+    assert delta['added'] and delta['removed']
+    assert os.path.abspath(first) not in datasets._frames
+    assert os.path.abspath(first) not in datasets._path_locks
+    assert os.path.abspath(second) in datasets._frames
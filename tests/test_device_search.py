@@ -0,0 +1,20 @@
+from datetime import datetime
+import pandas as pd
+import algorithms
+
+
+def test_lookup_device_handles_single_day_courses():
+    myteam_df = pd.DataFrame({
+        'Course': ['SIN24-2500001'],
+        'From': pd.to_datetime(['2025-01-15']),
+        'To': pd.to_datetime(['2025-01-15']),
+        'Trainee Code': ['T1'],
+    })
+    assets_df = pd.DataFrame({'Asset ID': ['L1', 'AIP1'], 'Location': ['SIN24-2500001', 'SIN24-2500001']})
+    index = algorithms.build_device_index(myteam_df, assets_df)
+
+    result = algorithms.lookup_device(index, 'L1', today=datetime(2025, 1, 15, 12))
+
+    assert result['Completion Percentage'] == 100
+    assert result['From'] == result['To'] == '15 Jan 2025'
+    assert result['Other Asset IDs'] == ['AIP1']
@@ -0,0 +1,32 @@
+import json
+import os
+from datetime import datetime
+import pytest
+from openpyxl import load_workbook
+import algorithms
+from conftest import SAMPLE_ASSETS, SAMPLE_MYTEAM
+
+# Overdue lists written by the original row-by-row implementation for the sample uploads,
+# keyed by '<today> <OD_Days>', as the cell values of the workbook
+EXPECTED = os.path.join(os.path.dirname(__file__), 'data', 'overdue_devices.json')
+
+with open(EXPECTED) as file:
+    EXPECTED_ROWS = json.load(file)
+
+
+@pytest.mark.parametrize('case', sorted(EXPECTED_ROWS))
+def test_overdue_list_matches_the_original_implementation(case, monkeypatch, tmp_path):
+    today, od_days = case.split()
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromisoformat(f'{today}T09:00')
+
+    monkeypatch.setattr(algorithms, 'datetime', FixedDatetime)
+    monkeypatch.setattr(algorithms.tempfile, 'gettempdir', lambda: str(tmp_path))
+
+    file_path = algorithms.process_overdue_devices_with_save(SAMPLE_MYTEAM, SAMPLE_ASSETS, int(od_days), output_file='overdue')
+
+    rows = [list(row) for row in load_workbook(file_path).active.iter_rows(values_only=True)]
+    assert rows == EXPECTED_ROWS[case]
@@ -0,0 +1,20 @@
+import datetime
+import numpy as np
+import pandas as pd
+import snapshots
+
+
+def test_mixed_columns_round_trip_without_pickle(tmp_path):
+    source = tmp_path / 'SIN_export.xlsx'
+    source.write_bytes(b'workbook')
+    mixed = [1, '1', 1.0, True, np.nan, pd.Timestamp('2025-01-02 03:04'), datetime.date(2025, 1, 3), datetime.time(9, 30)]
+    df = pd.DataFrame({'Staff ID': pd.Series(mixed, dtype=object), 'Seat Number': np.arange(len(mixed))})
+
+    snapshots.write_snapshot(df, str(source))
+    with np.load(snapshots.snapshot_path(str(source)), allow_pickle=False) as archive:
+        assert not any(archive[name].dtype.hasobject for name in archive.files)
+
+    loaded = snapshots.read_snapshot(str(source))
+    assert [type(value) for value in loaded['Staff ID']] == [type(value) for value in mixed]
+    assert loaded['Staff ID'].tolist()[:4] == [1, '1', 1.0, True]
+    assert loaded['Staff ID'].tolist()[5:] == mixed[5:]
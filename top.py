@@ -1,38 +1,35 @@
 from flask import Blueprint, render_template, request, jsonify
 import os
-import pandas as pd
-import plotly.express as px
-import json
 from datetime import datetime, timedelta
-from algorithms import process_course_data_with_date_filter, count_courses_per_month, process_device_info, count_fleet_per_month  # Import the function
-import plotly.graph_objects as go
+import datasets
+from configuration import get_config
+import store
+from cache import chart_cache, course_table_cache, config_hash
+from metrics import span
 
 top_bp = Blueprint('top', __name__, template_folder='templates')
 
-uploaded_files = {}
+# Chart data and course tables only change when an upload or the settings change
+datasets.on_invalidate(lambda file_path: chart_cache.clear())
+datasets.on_invalidate(lambda file_path: course_table_cache.clear())
 
-# Load configuration from the JSON file
-def load_config():
-    try:
-        with open('config.json', 'r') as file:
-            config = json.load(file)
-        return config
-    except Exception as e:
-        return None
-    
-# Load config data
-config = load_config()
+def cached_chart(chart_type, file_path, settings, builder, date_params=None):
+    """
+    Returns chart data from the chart cache, building it with builder() on a miss.
+
+    The cache key covers the chart type, the dataset version of file_path, a hash of the
+    settings the chart depends on and any date parameters.
 
-# Check if config is loaded properly
-if config is None:
-    exit()
+    Returns:
+        tuple: (data, etag), where etag identifies this version of the data.
+    """
+    key = (chart_type, datasets.dataset_version(file_path), config_hash(*settings), date_params)
 
-# Extract values from the config dictionary
-rsaf_laptops = config["rsaf_laptops"]
-a380_laptops = config["a380_laptops"]
-cannot_assign_laptops = config["cannot_assign_laptops"]
-cannot_assign_ipads = config["cannot_assign_ipads"]
-include_course_types = config['include_course_types']
+    def build():
+        with span(f'chart_{chart_type}'):
+            return builder()
+
+    return chart_cache.get_or_set(key, build), config_hash(*key)
 
 # Helper function to get the date for this Thursday
 def get_this_thursday():
@@ -41,101 +38,96 @@ def get_this_thursday():
     this_thursday = today + timedelta(days=days_until_thursday)
     return this_thursday.strftime('%Y-%m-%d')
 
-def generate_laptops_donut_chart():
-    # Ensure assets file is uploaded
-    if 'assets' not in uploaded_files:
+def laptops_donut_data(assets_file, config):
+    # Laptop counts per category, in display order
+    counts = config_inventory_counts(assets_file, config)['laptops']
+    return {'labels': list(counts), 'values': list(counts.values())}
+
+def ipads_donut_data(assets_file, config):
+    # iPad counts per category, in display order
+    counts = config_inventory_counts(assets_file, config)['ipads']
+    return {'labels': list(counts), 'values': list(counts.values())}
+
+def monthly_bar_data(myteam_file, config):
+    from algorithms import monthly_device_counts
+
+    # Laptops and iPads needed per month, or None if the columns are missing
+    monthly_counts = monthly_device_counts(myteam_file, config['include_course_types'])
+    if monthly_counts is None:
         return None
-    
-    # Load the CSV file
-    file_path = uploaded_files['assets']
-    df = pd.read_csv(file_path)
-    
-    # Filter for laptops
-    laptops = df[(df['Asset ID'].str.startswith('L')) & (df['Status'] == 'Ready')]
-    
-    # Initialize counters for the different sections
-    categories = {
-        'Standard': 0,
-        'Ongoing Course': 0,
-        'RSAF Laptops': 0,
-        'A380 Laptops': 0
+    return {
+        'months': monthly_counts['Month'].tolist(),
+        'series': [{'name': name, 'counts': monthly_counts[name].tolist()} for name in ['Laptops', 'iPads']]
     }
-    
-    # Filter laptops based on conditions
-    for _, row in laptops.iterrows():
-        asset_id = row['Asset ID']
-        location = row['Location']
-        # Skip laptops in the 'cannot_assign_laptops' list
-        if asset_id in cannot_assign_laptops:
-            continue
-        
-        # Check for RSAF Laptops
-        if asset_id in rsaf_laptops and location == 'M01-13':
-            categories['RSAF Laptops'] += 1
-            continue
-        
-        # Check for A380 Laptops
-        if asset_id in a380_laptops and location == 'M01-13':
-            categories['A380 Laptops'] += 1
-            continue
-        
-        # Check for 'M01-13' and 'Ongoing Course' categories based on location
-        if location == 'M01-13':
-            categories['Standard'] += 1
-        elif str(location).startswith('SIN'):
-            categories['Ongoing Course'] += 1
-
-    # Prepare data for the donut chart
-    chart_data = pd.DataFrame(list(categories.items()), columns=['Location', 'Count'])
-    
-    # Create donut chart
-    fig = px.pie(chart_data, names='Location', values='Count', hole=0.4,
-                 title='Laptop inventory')
-    
-    # Update traces to show label + value
-    fig.update_traces(textinfo='label+value')  # This will show label and count
-    
-    return fig.to_html(full_html=False)
 
-def generate_ipads_donut_chart():
-    # Ensure assets file is uploaded
-    if 'assets' not in uploaded_files:
+def monthly_fleet_data(myteam_file, config):
+    from algorithms import monthly_device_counts
+
+    # Courses per month and aircraft type, or None if the columns are missing
+    monthly_counts = monthly_device_counts(myteam_file, config['include_course_types'])
+    if monthly_counts is None:
         return None
-    
-    # Load the CSV file
-    file_path = uploaded_files['assets']
-    df = pd.read_csv(file_path)
-    
-    # Filter for iPads (Asset ID starts with 'A' and Status is 'Ready')
-    ipads = df[(df['Asset ID'].str.startswith('A')) & (df['Status'] == 'Ready')]
-    
-    # Initialize counters for the different sections
-    categories = {
-        'M01-13': 0,
-        'Ongoing Course': 0
+    return {
+        'months': monthly_counts['Month'].tolist(),
+        'series': [{'name': name, 'counts': monthly_counts[name].tolist()} for name in ['A320', 'A330', 'A350', 'A380']]
     }
-    
-    # Filter iPads based on conditions
-    for _, row in ipads.iterrows():
-        asset_id = row['Asset ID']
-        location = row['Location']
-        
-        # Check for 'M01-13' location
-        if location == 'M01-13':
-            categories['M01-13'] += 1
-        elif str(location).startswith('SIN'):
-            categories['Ongoing Course'] += 1
-    # Prepare data for the donut chart
-    chart_data = pd.DataFrame(list(categories.items()), columns=['Category', 'Count'])
-    
-    # Create donut chart
-    fig = px.pie(chart_data, names='Category', values='Count', hole=0.4,
-                 title='iPad inventory')
-    
-    # Update traces to show label + value
-    fig.update_traces(textinfo='label+value')  # This will show label and count
-    
-    return fig.to_html(full_html=False)
+
+def config_inventory_counts(assets_file, config):
+    from algorithms import inventory_counts
+
+    # Inventory counts with the laptop lists from the settings
+    return inventory_counts(assets_file, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'])
+
+# Longest shortfall forecast, in weeks
+MAX_FORECAST_WEEKS = 104
+
+def forecast_data(myteam_file, assets_file, config, weeks):
+    """
+    Returns (data, etag) of the daily laptop and iPad shortfall forecast for the next weeks,
+    cached per dataset version, settings, day and number of weeks.
+    """
+    from algorithms import shortfall_forecast
+
+    settings = [config['include_course_types'], config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']]
+    today = datetime.now().date()
+    key = ('forecast', datasets.dataset_version(myteam_file, assets_file), config_hash(*settings), today, weeks)
+
+    def build():
+        with span('chart_forecast'):
+            return shortfall_forecast(myteam_file, assets_file, *settings, today, weeks * 7)
+
+    return chart_cache.get_or_set(key, build), config_hash(*key)
+
+# Chart type -> (upload the chart is built from, data builder)
+CHARTS = {
+    'laptops_donut': ('assets', laptops_donut_data),
+    'ipads_donut': ('assets', ipads_donut_data),
+    'monthly_bar': ('myteam', monthly_bar_data),
+    'monthly_fleet': ('myteam', monthly_fleet_data)
+}
+
+def get_chart_data(chart_type):
+    """
+    Returns (data, etag) for one of the CHARTS, or (None, None) if its upload is missing.
+    """
+    upload, builder = CHARTS[chart_type]
+    file_path = store.latest_upload(upload)
+    if file_path is None:
+        return None, None
+
+    config = get_config()
+    if upload == 'assets':
+        settings = [config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops']]
+    else:
+        settings = [config['include_course_types']]
+    return cached_chart(chart_type, file_path, settings, lambda: builder(file_path, config))
+
+def chart_response(payload, etag):
+    # Let the browser revalidate with If-None-Match and get a 304 while the data is unchanged
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @top_bp.route('/', methods=['GET', 'POST'])
 def index():
@@ -148,57 +140,80 @@ def index():
     except ValueError:
         end_date = datetime.strptime(get_this_thursday(), "%Y-%m-%d").date()  # Fallback to this Thursday
 
-    # Check for existing files in the 'uploads' directory
-    myteam_file_detected = False
-    assets_file_detected = False
-    donut_chart_l = None  # Initialize the variable for laptop donut chart
-    donut_chart_a = None  # Initialize the variable for iPad donut chart
+    # Look up the current uploads in the store
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
+    myteam_file_detected = myteam_file is not None
+    assets_file_detected = assets_file is not None
     course_data_results = []  # Initialize a list to hold course data
 
-    # Check for files that match the naming criteria
-    for file in os.listdir('uploads'):
-        if file.startswith('SIN') and file.endswith('.xlsx'):
-            uploaded_files['myteam'] = os.path.join('uploads', file)
-            myteam_file_detected = True
-        if file.startswith('assets') and file.endswith('.csv'):
-            uploaded_files['assets'] = os.path.join('uploads', file)
-            assets_file_detected = True
-
     # Call the course processing function if both files are available
     if myteam_file_detected and assets_file_detected:
+        from algorithms import process_course_data_with_date_filter
+
         # Call the function and pass the paths of the files
-        results = process_course_data_with_date_filter(
-            uploaded_files['assets'], 
-            uploaded_files['myteam'],
-            end_date=end_date  # Pass the selected end date to the function
-        )
+        try:
+            results = process_course_data_with_date_filter(
+                assets_file, 
+                myteam_file,
+                end_date=end_date  # Pass the selected end date to the function
+            )
+        except Exception as e:
+            print(f"Error processing files: {e}")
+            results = []
         # Save the results for rendering in the template
         course_data_results = results
 
-    if myteam_file_detected:
-        monthly_bar_chart = generate_monthly_bar_chart()
-        monthly_fleet_chart = generate_monthly_fleet_chart()
-    
-    # If assets file is detected, generate the donut charts
-    if assets_file_detected:
-        donut_chart_l = generate_laptops_donut_chart()
-        donut_chart_a = generate_ipads_donut_chart()
-
-    # Pass the status, course data, both donut charts, search_results, and the end_date to the frontend
+    # Pass the status, course data and the end_date to the frontend; the charts are
+    # drawn in the browser from /top/api/charts
     return render_template(
         'top.html',
         myteam_file_detected=myteam_file_detected,
         assets_file_detected=assets_file_detected,
-        donut_chart_l=donut_chart_l,  # Pass laptop donut chart
-        donut_chart_a=donut_chart_a,  # Pass iPad donut chart
         course_data_results=course_data_results,  # Pass the course data to the template
-        end_date=end_date.strftime('%Y-%m-%d'),  # Format date as string
-        monthly_bar_chart=monthly_bar_chart,
-        monthly_fleet_chart=monthly_fleet_chart
+        end_date=end_date.strftime('%Y-%m-%d')  # Format date as string
     )
 
 
 
+def course_table_html(assets_file, myteam_file, end_date):
+    """
+    Returns the 'Courses Ending' table rows for end_date, cached per dataset version, day and end_date.
+
+    A table that fails to build is returned empty and not cached, so the next request retries it.
+    """
+    def build():
+        from algorithms import process_course_data_with_date_filter
+
+        with span('course_table'):
+            # Process the course data with the selected end date
+            results = process_course_data_with_date_filter(assets_file, myteam_file, end_date=end_date)
+
+        # Prepare the course data for the table
+        rows = []
+        for course_data in results:
+            parts = course_data.split(' - ')
+            rows.append(f"""
+            <tr>
+                <td>{parts[0]}</td>
+                <td>{parts[1]}</td>
+                <td>{parts[2]}</td>
+            </tr>
+            """)
+        return ''.join(rows)
+
+    try:
+        if not (os.path.isfile(assets_file) and os.path.isfile(myteam_file)):
+            return build()
+
+        # Results start at today's date, so the day is part of the key as well
+        key = (datasets.dataset_version(myteam_file, assets_file), datetime.now().date(), end_date)
+        return course_table_cache.get_or_set(key, build)
+    except Exception as e:
+        # get_or_set only stores what build() returns, so a failure is never cached
+        print(f"Error processing files: {e}")
+        return ''
+
 @top_bp.route('/update_date', methods=['GET'])
 def update_date():
     # Get the new date from the query parameter (or use a default if not provided)
@@ -208,33 +223,14 @@ def update_date():
     end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
     # Ensure both files are available
-    myteam_file_detected = 'myteam' in uploaded_files
-    assets_file_detected = 'assets' in uploaded_files
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
 
     # Initialize the response dictionary
     response = {}
-    if myteam_file_detected and assets_file_detected:
-        # Process the course data with the selected end date
-        results = process_course_data_with_date_filter(
-            uploaded_files['assets'], 
-            uploaded_files['myteam'],
-            end_date=end_date
-        )
-        
-        # Prepare the course data for the table
-        course_data_html = ""
-        for course_data in results:
-            parts = course_data.split(' - ')
-            course_data_html += f"""
-            <tr>
-                <td>{parts[0]}</td>
-                <td>{parts[1]}</td>
-                <td>{parts[2]}</td>
-            </tr>
-            """
-        
+    if myteam_file is not None and assets_file is not None:
         # Add the HTML for the updated course table to the response
-        response['course_table'] = course_data_html
+        response['course_table'] = course_table_html(assets_file, myteam_file, end_date)
 
     # Return the updated course table as JSON
     return jsonify(response)
@@ -243,18 +239,174 @@ def update_date():
 @top_bp.route('/get_search_results', methods=['POST'])
 def get_search_results():
     # Get the incoming JSON data (which includes deviceId)
-    data = request.get_json()
-    device_id = data.get('deviceId')
+    data = request.get_json(silent=True)
+    device_id = data.get('deviceId') if isinstance(data, dict) else None
 
-    if not device_id:
+    if not device_id or not isinstance(device_id, str):
         return jsonify({"error": "Device ID is required"}), 400
     
-    # Assuming uploaded_files['myteam'] and uploaded_files['assets'] are available
-    # Process the device info with the device_id passed from the frontend
-    search_results_py = process_device_info(uploaded_files['myteam'], uploaded_files['assets'], device_id)
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
+    if myteam_file is None or assets_file is None:
+        return jsonify({"error": "Both MyTeam and Assets files are required."}), 400
+
+    from algorithms import lookup_device
+
+    # Process the device info with the device_id passed from the frontend, using indexed queries
+    index = store.device_index(myteam_file, assets_file, [device_id])
+    search_results_py = lookup_device(index, device_id)
     # Return the processed results as a JSON response
     return jsonify(search_results_py)
 
+@top_bp.route('/get_search_results_batch', methods=['POST'])
+def get_search_results_batch():
+    # Get the incoming JSON data (a list of device IDs, e.g. from a barcode-scanner sweep)
+    data = request.get_json(silent=True)
+    device_ids = data.get('deviceIds') if isinstance(data, dict) else None
+
+    if not device_ids or not isinstance(device_ids, list) or not all(isinstance(device_id, str) for device_id in device_ids):
+        return jsonify({"error": "A list of device IDs is required"}), 400
+
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
+    if myteam_file is None or assets_file is None:
+        return jsonify({"error": "Both MyTeam and Assets files are required."}), 400
+
+    from algorithms import lookup_device
+
+    # Resolve every device with one set of indexed queries
+    index = store.device_index(myteam_file, assets_file, device_ids)
+    search_results_py = [lookup_device(index, device_id) for device_id in device_ids]
+    return jsonify({"results": search_results_py})
+
+@top_bp.route('/availability', methods=['GET'])
+def availability():
+    # Devices of one kind and allocation pool that are free for the whole of start_date to end_date
+    try:
+        start_date = datetime.strptime(request.args['start_date'], "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.args.get('end_date', request.args['start_date']), "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        return jsonify({"error": "start_date (and optionally end_date) are required as YYYY-MM-DD."}), 400
+    if end_date < start_date:
+        return jsonify({"error": "The end date is before the start date."}), 400
+
+    from algorithms import DEVICE_KINDS, availability_calendar, device_pool, free_devices
+
+    kind = request.args.get('kind', 'laptops')
+    if kind not in DEVICE_KINDS:
+        return jsonify({"error": f"Unknown device kind {kind}."}), 400
+    pool = request.args.get('pool', DEVICE_KINDS[kind][0])
+    if pool not in DEVICE_KINDS[kind]:
+        return jsonify({"error": f"Unknown {kind} pool {pool}."}), 400
+
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
+    if myteam_file is None or assets_file is None:
+        return jsonify({"error": "Both MyTeam and Assets files are required."}), 400
+
+    config = get_config()
+    included, excluded = device_pool(
+        kind, pool, config['rsaf_laptops'], config['a380_laptops'], config['cannot_assign_laptops'], config['cannot_assign_ipads']
+    )
+    devices = free_devices(availability_calendar(myteam_file, assets_file), start_date, end_date, kind, included, excluded)
+    return jsonify({"kind": kind, "pool": pool, "count": len(devices), "devices": devices})
+
+@top_bp.route('/device-return/<device_id>', methods=['GET'])
+def get_device_return(device_id):
+    # When a device is back in the store room
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
+    if myteam_file is None or assets_file is None:
+        return jsonify({"error": "Both MyTeam and Assets files are required."}), 400
+
+    from algorithms import availability_calendar, device_return
+
+    result = device_return(availability_calendar(myteam_file, assets_file), device_id)
+    return jsonify(result), 404 if "error" in result else 200
+
+@top_bp.route('/device-history/<device_id>', methods=['GET'])
+def get_device_history(device_id):
+    # Where a device has been across the archived assets exports, and optionally the device
+    # search as it stood at the end of as_of. Uploads archive the exports; the first read in a
+    # process picks up exports that were there before the history was
+    store.ensure_asset_history()
+    timeline = store.asset_timeline(device_id)
+    if not timeline:
+        return jsonify({"error": f"Device ID {device_id} not found in any assets export."}), 404
+    result = {"Asset ID": device_id, "Timeline": timeline}
+
+    if 'as_of' in request.args:
+        try:
+            as_of = datetime.strptime(request.args['as_of'], "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"error": "as_of must be a YYYY-MM-DD date."}), 400
+
+        snapshot_ts, states = store.asset_states((as_of + timedelta(days=1)).timestamp())
+        if snapshot_ts is None:
+            return jsonify({"error": f"No assets export was taken by {request.args['as_of']}."}), 404
+
+        myteam_file = store.latest_upload('myteam')
+        assets_file = store.latest_upload('assets')
+        if myteam_file is None:
+            return jsonify({"error": "A MyTeam file is required."}), 400
+
+        from algorithms import device_index, lookup_device_as_of
+
+        result["Snapshot"] = datetime.fromtimestamp(snapshot_ts).strftime('%Y-%m-%d %H:%M:%S')
+        result["As Of"] = lookup_device_as_of(device_index(myteam_file, assets_file), states, device_id, as_of)
+    return jsonify(result)
+
+@top_bp.route('/api/charts', methods=['GET'])
+def get_charts():
+    # Data series of every chart on the page; a chart is null until its upload is available
+    charts = {}
+    etags = []
+    for chart_type in CHARTS:
+        charts[chart_type], etag = get_chart_data(chart_type)
+        etags.append(etag)
+    return chart_response(charts, config_hash(*etags))
+
+@top_bp.route('/api/charts/<chart_type>', methods=['GET'])
+def get_chart(chart_type):
+    # Data series of a single chart
+    if chart_type not in CHARTS:
+        return jsonify({"error": f"Unknown chart {chart_type}."}), 404
+    data, etag = get_chart_data(chart_type)
+    if data is None:
+        return jsonify({"error": "Chart data is not available yet."}), 404
+    return chart_response(data, etag)
+
+@top_bp.route('/api/forecast', methods=['GET'])
+def get_forecast():
+    # Daily laptop and iPad balance and shortfall of the store room for the next weeks
+    try:
+        weeks = int(request.args.get('weeks', 12))
+    except ValueError:
+        weeks = 0
+    if not 1 <= weeks <= MAX_FORECAST_WEEKS:
+        return jsonify({"error": f"weeks must be a number from 1 to {MAX_FORECAST_WEEKS}."}), 400
+
+    myteam_file = store.latest_upload('myteam')
+    assets_file = store.latest_upload('assets')
+    if myteam_file is None or assets_file is None:
+        return jsonify({"error": "Both MyTeam and Assets files are required."}), 400
+
+    data, etag = forecast_data(myteam_file, assets_file, get_config(), weeks)
+    return chart_response(data, etag)
+
+@top_bp.route('/inventory-counts', methods=['GET'])
+def get_inventory_counts():
+    # Donut chart category counts, for redrawing the charts on the client
+    assets_file = store.latest_upload('assets')
+    if assets_file is None:
+        return jsonify({"error": "Assets file not uploaded."}), 404
+    return jsonify(config_inventory_counts(assets_file, get_config()))
+
+@top_bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    # Report chart and course table cache hits and misses
+    return jsonify({"charts": chart_cache.stats(), "course_tables": course_table_cache.stats()})
+
 @top_bp.route('/search-device', methods=['POST'])
 def search_device():
     # Get the incoming data (deviceId) from the request
@@ -269,143 +421,3 @@ def search_device():
     
     return jsonify(response_data)
     
-
-def generate_monthly_bar_chart():
-    results_count = count_courses_per_month(uploaded_files['myteam'], include_course_types=include_course_types)
-
-    # Prepare the months and counts for laptops and iPads
-    months = []
-    laptops_count = []
-    ipads_count = []
-    for result in results_count:
-        # Format: 'October 2024: 6 0'
-        month, counts = result.split(': ')
-        laptop_count, ipad_count = map(int, counts.split())
-
-        months.append(month)
-        laptops_count.append(laptop_count)
-        ipads_count.append(ipad_count)
-
-    # Create the bar chart with Plotly
-    fig = go.Figure()
-    # Add bottom bar (laptops)
-    fig.add_trace(go.Bar(
-        x=months,
-        y=laptops_count,
-        name='Laptops',
-        marker_color='blue',
-        base=0  # Bottom bar starts at 0
-    ))
-
-    # Add upper bar (iPads)
-    fig.add_trace(go.Bar(
-        x=months,
-        y=ipads_count,
-        name='iPads',
-        marker_color='orange',
-        base=laptops_count  # Upper bar starts at the value of the laptops count
-    ))
-
-    # Customize layout
-    fig.update_layout(
-        title='Monthly Laptop and iPad Count',
-        barmode='stack',  # Stack the bars
-        xaxis_title='Month',
-        yaxis_title='Count',
-        template='plotly_white',  # Use a clean white template
-        showlegend=True
-    )
-    return fig.to_html(full_html=False)
-
-import plotly.graph_objects as go
-
-def generate_monthly_fleet_chart():
-    results_count = count_fleet_per_month(uploaded_files['myteam'], include_course_types=include_course_types)
-
-    # Prepare the months and counts for A320, A330, A350, and A380
-    months = []
-    a320_count = []
-    a330_count = []
-    a350_count = []
-    a380_count = []
-    
-    for result in results_count:
-
-        # Split into month and counts
-        parts = result.split(': ', 1)  # Split only on the first ': ' to get the month and the rest
-
-        if len(parts) == 2:
-            month = parts[0]
-            counts_str = parts[1]
-            
-            # Split counts by ', ' and further split by ': ' to get the count for each aircraft type
-            fleet_counts = [count.split(': ') for count in counts_str.split(', ')]
-
-            
-            # Ensure there are exactly four counts for A320, A330, A350, A380
-            if len(fleet_counts) == 4:
-                a320 = int(fleet_counts[0][1])
-                a330 = int(fleet_counts[1][1])
-                a350 = int(fleet_counts[2][1])
-                a380 = int(fleet_counts[3][1])
-
-                # Append to the lists
-                months.append(month)
-                a320_count.append(a320)
-                a330_count.append(a330)
-                a350_count.append(a350)
-                a380_count.append(a380)
-            else:
-                print(f"Skipping invalid result due to incorrect fleet counts: {result}")
-        else:
-            print(f"Skipping invalid result due to split issue: {result}")
-    
-    # Create the bar chart with Plotly
-    fig = go.Figure()
-
-    # Add bars for each aircraft type
-    fig.add_trace(go.Bar(
-        x=months,
-        y=a320_count,
-        name='A320',
-        marker_color='blue',
-        base=0
-    ))
-
-    fig.add_trace(go.Bar(
-        x=months,
-        y=a330_count,
-        name='A330',
-        marker_color='green',
-        base=a320_count  # Stack on top of A320
-    ))
-
-    fig.add_trace(go.Bar(
-        x=months,
-        y=a350_count,
-        name='A350',
-        marker_color='red',
-        base=[sum(x) for x in zip(a320_count, a330_count)]  # Stack on top of A320 + A330
-    ))
-
-    fig.add_trace(go.Bar(
-        x=months,
-        y=a380_count,
-        name='A380',
-        marker_color='orange',
-        base=[sum(x) for x in zip(a320_count, a330_count, a350_count)]  # Stack on top of A320 + A330 + A350
-    ))
-
-    # Customize layout
-    fig.update_layout(
-        title='Monthly Aircraft Type Count',
-        barmode='stack',  # Stack the bars
-        xaxis_title='Month',
-        yaxis_title='Count',
-        template='plotly_white',
-        showlegend=True
-    )
-    
-    return fig.to_html(full_html=False)
-
-
@@ -0,0 +1,101 @@
+"""
+Production entry point for the TMM Dashboard.
+
+Run it under a multi-worker WSGI server, for example:
+    gunicorn --workers 4 --bind 0.0.0.0:8000 wsgi:app
+
+or let this script pick a server:
+    python wsgi.py --workers 4 --port 8000
+
+All state that has to agree between workers (upload registry, seats/assets tables,
+allocations, report jobs) lives in the SQLite store and config.json; the in-process
+caches are keyed by dataset version and settings, so each worker's copy stays correct.
+"""
+import argparse
+import os
+import signal
+from app import app
+
+
+def serve_gunicorn(host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+
+        def load(self):
+            return app
+
+    DashboardApplication().run()
+
+
+def serve_waitress(host, port, threads):
+    from waitress import serve
+    serve(app, host=host, port=port, threads=threads)
+
+
+def serve_prefork(host, port, workers):
+    """
+    Minimal pre-fork server for POSIX systems without gunicorn: the parent binds the socket
+    and forks workers that all accept connections on it.
+    """
+    from werkzeug.serving import make_server
+
+    # The app imports its data libraries on first use; load them once here so the forked
+    # workers share them and none pays for the import on its first request
+    import algorithms
+    import reports
+
+    server = make_server(host, port, app, threaded=True)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Serving on http://{host}:{port} with {workers} worker processes")
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    except KeyboardInterrupt:
+        stop(signal.SIGINT, None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the TMM Dashboard with multiple workers.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker.')
+    args = parser.parse_args()
+
+    if not os.path.exists('uploads'):
+        os.makedirs('uploads')
+
+    try:
+        serve_gunicorn(args.host, args.port, args.workers, args.threads)
+    except ImportError:
+        if hasattr(os, 'fork'):
+            serve_prefork(args.host, args.port, args.workers)
+        else:
+            # Windows has no fork; waitress serves from one process with a thread pool
+            try:
+                serve_waitress(args.host, args.port, args.workers * args.threads)
+            except ImportError:
+                app.run(host=args.host, port=args.port, threaded=True)